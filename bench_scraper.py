@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Banco de pruebas end-to-end del scraper contra el servidor RSCE simulado.
+- Arranca fake_rsce_server en un hilo (listado + Nominatim falso)
+- Ejecuta RSCEAgilityExporter().run() contra él, en una carpeta temporal
+- Informa de throughput (eventos/s) y latencia por etapa (descarga, parseo,
+  geocodificación, escritura) a partir de metricas_run.json
+
+    python bench_scraper.py --paginas 50 --eventos 5000 --latencia 0.05 --jitter 0.03 --errores 0.02
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import fake_rsce_server
+
+
+def _argumentos():
+    ap = argparse.ArgumentParser(description="Benchmark end-to-end del scraper RSCE (offline)")
+    ap.add_argument("--paginas", type=int, default=50)
+    ap.add_argument("--eventos", type=int, default=5000)
+    ap.add_argument("--latencia", type=float, default=0.0)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--errores", type=float, default=0.0)
+    ap.add_argument("--geocoder-errores", type=float, default=0.0, help="503 en los geocodificadores falsos")
+    ap.add_argument("--anulados", type=float, default=0.1)
+    ap.add_argument("--duplicados", type=float, default=0.0)
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--puerto", type=int, default=8765, help="0 = puerto libre aleatorio")
+    ap.add_argument("--sin-geocodificar", action="store_true", help="GEOCODIFICAR=false")
+    ap.add_argument("--photon", action="store_true", help="GEOCODERS=nominatim,photon")
+    ap.add_argument("--geocode-concurrencia", type=int, default=1, help="hilos por geocodificador")
+    ap.add_argument("--nominatim-vacias", type=float, default=0.0)
+    ap.add_argument("--detalle", action="store_true", help="ENRIQUECER_DETALLE=true")
+    ap.add_argument("--detalle-concurrencia", type=int, default=4)
+    ap.add_argument("--detalle-rps", type=float, default=0, help="peticiones/s por host (0 = sin límite)")
+    ap.add_argument("--carpeta", help="carpeta de trabajo (por defecto una temporal nueva)")
+    ap.add_argument("--salida", help="guardar el informe completo en este JSON")
+    return ap.parse_args()
+
+
+def preparar_entorno(puerto: int, carpeta: str, args):
+    base = f"http://127.0.0.1:{puerto}"
+    os.environ.update(
+        {
+            "URL_BASE": f"{base}/eventos-rsce/",
+            "CARPETA_DESTINO": os.path.join(carpeta, "resultados"),
+            "CARPETA_CACHE": os.path.join(carpeta, "cache"),
+            "MAX_PAGINAS": str(args.paginas + 1),
+            "SOLO_PRIMERA_PAGINA": "false",
+            "USAR_SELENIUM": "false",
+            "GEOCODIFICAR": "false" if args.sin_geocodificar else "true",
+            "NOMINATIM_DOMAIN": f"127.0.0.1:{puerto}",
+            "NOMINATIM_SCHEME": "http",
+            "GEOCODE_MIN_DELAY": "0",
+            "GEOCODERS": "nominatim,photon" if args.photon else "nominatim",
+            "PHOTON_DOMAIN": f"127.0.0.1:{puerto}",
+            "PHOTON_SCHEME": "http",
+            "PHOTON_MIN_DELAY": "0",
+            "NOMINATIM_CONCURRENCIA": str(args.geocode_concurrencia),
+            "PHOTON_CONCURRENCIA": str(args.geocode_concurrencia),
+            "ENRIQUECER_DETALLE": "true" if args.detalle else "false",
+            "DETALLE_CONCURRENCIA": str(args.detalle_concurrencia),
+            "DETALLE_POR_SEGUNDO": str(args.detalle_rps),
+        }
+    )
+
+
+def imprimir_informe(m: dict):
+    run_s = m.get("run_s") or 0
+    brutos = m.get("eventos_brutos", 0)
+
+    print("\n===================== Benchmark =====================")
+    print(f"Arranque:            {m.get('arranque_s')} s")
+    print(f"Run:                 {run_s} s")
+    print(f"Primera fila:        {m.get('primera_fila_s')} s")
+    print(f"Eventos brutos:      {brutos}")
+    print(f"Eventos exportados:  {m.get('eventos_filtrados', 0)}")
+    print(f"Throughput:          {brutos / run_s if run_s else 0:.1f} eventos/s")
+    if "duplicados" in m:
+        print(f"Duplicados:          {m['duplicados']}")
+    for nombre, p in m.get("geocodificacion", {}).get("proveedores", {}).items():
+        print(
+            f"Geocoder {nombre:<11}{p['consultas']} consultas, acierto {p['tasa_acierto']}, "
+            f"{p['errores']} errores, media {p['media_ms']} ms, p95 {p['p95_ms']} ms"
+        )
+    if "detalle" in m:
+        print(f"Detalle:             {m['detalle']}")
+    print("")
+    print(f"{'etapa':<18}{'n':>7}{'total s':>10}{'media ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+
+    for etapa, e in m.get("etapas", {}).items():
+        print(
+            f"{etapa:<18}{e['n']:>7}{e['total_s']:>10}{e['media_ms']:>10}"
+            f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['max_ms']:>9}"
+        )
+
+    print("=====================================================")
+
+
+if __name__ == "__main__":
+    args = _argumentos()
+    carpeta = args.carpeta or tempfile.mkdtemp(prefix="bench_rsce_")
+    os.makedirs(carpeta, exist_ok=True)
+
+    # Puerto fijo por defecto: las URLs de los eventos incluyen host:puerto, y así
+    # dos runs sobre la misma --carpeta producen las mismas salidas.
+    srv = fake_rsce_server.arrancar_en_hilo(fake_rsce_server.config_desde_args(args), puerto=args.puerto)
+    puerto = srv.server_address[1]
+    preparar_entorno(puerto, carpeta, args)
+
+    # debug_rsce/ y demás rutas relativas quedan dentro de la carpeta de trabajo.
+    os.chdir(carpeta)
+
+    # Import tras preparar el entorno: así el arranque medido es el real.
+    import scrape_rsce_csv_geo
+
+    exporter = scrape_rsce_csv_geo.RSCEAgilityExporter()
+
+    try:
+        exporter.run()
+    finally:
+        srv.shutdown()
+
+    imprimir_informe(exporter.metricas)
+    print(f"Resultados en: {carpeta}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(exporter.metricas, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Consultas rápidas sobre el histórico de eventos (SQLite) que guarda el scraper.
+- Recuento de eventos por provincia, mes, año o estado, con filtros de fechas
+- Transiciones de estado (p. ej. qué pruebas se anularon y cuándo)
+
+    python consultar_historico.py --por provincia --anio 2025
+    python consultar_historico.py --por mes --provincia Zaragoza --desde 2024-01-01
+    python consultar_historico.py --transiciones --estado Anulado
+"""
+
+import argparse
+import os
+import sqlite3
+
+AGRUPACIONES = {
+    "provincia": "COALESCE(NULLIF(provincia, ''), '(sin provincia)')",
+    "mes": "substr(inicio, 1, 7)",
+    "anio": "substr(inicio, 1, 4)",
+    "estado": "estado",
+}
+
+
+def _argumentos():
+    ap = argparse.ArgumentParser(description="Consultas sobre el histórico de eventos RSCE")
+    ap.add_argument(
+        "--archivo",
+        default=os.getenv("ARCHIVO_HISTORICO", os.path.join(os.getenv("CARPETA_CACHE", ".cache_rsce"), "historico.sqlite")),
+    )
+    ap.add_argument("--por", choices=sorted(AGRUPACIONES), default="provincia", help="agrupar el recuento")
+    ap.add_argument("--anio", type=int, help="solo eventos que empiezan ese año")
+    ap.add_argument("--desde", help="fecha de inicio mínima (AAAA-MM-DD)")
+    ap.add_argument("--hasta", help="fecha de inicio máxima (AAAA-MM-DD)")
+    ap.add_argument("--provincia")
+    ap.add_argument("--estado", help="Activo / Anulado")
+    ap.add_argument("--transiciones", action="store_true", help="listar cambios de estado en vez de contar")
+    return ap.parse_args()
+
+
+def _filtros(args):
+    """
+    Condiciones WHERE sobre 'eventos' (todas indexadas) y sus parámetros.
+    """
+    condiciones, params = [], []
+
+    desde, hasta = args.desde, args.hasta
+    if args.anio:
+        desde, hasta = f"{args.anio}-01-01", f"{args.anio}-12-31"
+
+    if desde:
+        condiciones.append("inicio >= ?")
+        params.append(desde)
+    if hasta:
+        condiciones.append("inicio <= ?")
+        params.append(hasta)
+    if args.provincia:
+        condiciones.append("provincia = ?")
+        params.append(args.provincia)
+    if args.estado and not args.transiciones:
+        condiciones.append("estado = ?")
+        params.append(args.estado)
+
+    return (" WHERE " + " AND ".join(condiciones) if condiciones else ""), params
+
+
+def recuento(con, args):
+    where, params = _filtros(args)
+    grupo = AGRUPACIONES[args.por]
+    sql = f"SELECT {grupo} AS g, COUNT(*) FROM eventos{where} GROUP BY g ORDER BY g"
+
+    filas = con.execute(sql, params).fetchall()
+    ancho = max([len(str(g)) for g, _ in filas] + [len(args.por)])
+
+    print(f"{args.por:<{ancho}}  eventos")
+    for g, n in filas:
+        print(f"{str(g):<{ancho}}  {n:>7}")
+    print(f"{'total':<{ancho}}  {sum(n for _, n in filas):>7}")
+
+
+def transiciones(con, args):
+    where, params = _filtros(args)
+    sql = f"""
+        SELECT s.desde, s.estado, e.inicio, e.provincia, e.nombre
+        FROM estados s JOIN (SELECT * FROM eventos{where}) e ON e.id = s.evento_id
+        WHERE s.ejecucion > (SELECT MIN(ejecucion) FROM estados WHERE evento_id = s.evento_id)
+    """
+    if args.estado:
+        sql += " AND s.estado = ?"
+        params.append(args.estado)
+
+    for desde, estado, inicio, provincia, nombre in con.execute(sql + " ORDER BY s.desde", params):
+        print(f"{desde}  -> {estado:<8} {inicio or '?':<10}  {provincia or '-':<14} {nombre}")
+
+
+if __name__ == "__main__":
+    args = _argumentos()
+
+    if not os.path.exists(args.archivo):
+        raise SystemExit(f"No existe el histórico: {args.archivo}")
+
+    con = sqlite3.connect(args.archivo)
+    try:
+        if args.transiciones:
+            transiciones(con, args)
+        else:
+            recuento(con, args)
+    finally:
+        con.close()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor local que imita el listado de eventos de RSCE (JetEngine) + un Nominatim falso.
+- Páginas de tarjetas con h2/enlace, fechas, ciudad en h3 y etiqueta "Anulado"
+- Paginación JetSmartFilters: <URL_BASE>/pagenum/N/
+- Latencia, jitter y errores 5xx configurables (listado y geocodificadores por separado)
+- Duplicados opcionales: el mismo evento con URL de seguimiento y título retocado
+- Páginas de detalle /evento/prueba-agility-N/ (organizador, dirección, jueces,
+  grados, mapa embebido) con ETag y 304 a peticiones condicionales
+- /search compatible con Nominatim (format=json, addressdetails), que puede dejar
+  sin resultado una parte de las consultas
+- /api compatible con Photon (GeoJSON), para probar la cadena de geocodificadores
+Sirve para medir el scraper sin tocar rsce.es:
+
+    python fake_rsce_server.py --paginas 50 --eventos 5000 --latencia 0.2 --errores 0.02
+    URL_BASE=http://127.0.0.1:8765/eventos-rsce/ NOMINATIM_DOMAIN=127.0.0.1:8765 \
+        NOMINATIM_SCHEME=http GEOCODE_MIN_DELAY=0 python scrape_rsce_csv_geo.py
+"""
+
+import argparse
+import datetime
+import hashlib
+import html
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+]
+
+# Variantes de escritura reales para ejercitar la normalización de ubicaciones.
+CIUDADES = [
+    ("Zaragoza", "Zaragoza"),
+    ("Cuarte de Huerva (Zaragoza)", "Zaragoza"),
+    ("Pabellón Municipal, Cuarte de Huerva", "Zaragoza"),
+    ("Alcalá de Henares (Madrid)", "Madrid"),
+    ("Leganés", "Madrid"),
+    ("Sant Cugat del Vallès (Barcelona)", "Barcelona"),
+    ("Polideportivo Municipal de Tres Cantos", "Madrid"),
+    ("Huesca", "Huesca"),
+    ("Jaca, Huesca", "Huesca"),
+    ("Dos Hermanas (Sevilla)", "Sevilla"),
+    ("Murcia", "Murcia"),
+    ("Oviedo", "Asturias"),
+    ("Gijón (Asturias)", "Asturias"),
+    ("Valladolid", "Valladolid"),
+    ("Getafe", "Madrid"),
+    ("Málaga", "Málaga"),
+    ("Finca Los Olivos · Alhaurín de la Torre", "Málaga"),
+    ("Vitoria-Gasteiz (Álava)", "Álava"),
+    ("Pamplona", "Navarra"),
+    ("Palma", "Illes Balears"),
+    ("Campo Real (Madrid)", "Madrid"),
+    ("Campo de Criptana", "Ciudad Real"),
+    ("Ca'n Picafort", "Illes Balears"),
+]
+
+JUECES = ["Ana Pérez", "Jordi Vidal", "Marta Ruiz", "Iñaki Etxeberria", "Luis Gómez"]
+
+CLUBES = ["C.A. Divertidog", "Club Agility Huesca", "C.D. Canino Norte", "Agility Sur", "Dog Sport Madrid"]
+
+
+@dataclass
+class Config:
+    paginas: int = 10
+    eventos: int = 500
+    latencia: float = 0.0
+    jitter: float = 0.0
+    errores: float = 0.0
+    geocoder_errores: float = 0.0
+    anulados: float = 0.1
+    duplicados: float = 0.0
+    nominatim_vacias: float = 0.0
+    semilla: int = 42
+    prefijo: str = "/eventos-rsce/"
+
+
+def generar_eventos(cfg: Config) -> list:
+    """
+    Eventos deterministas (misma semilla -> mismo listado), desde hoy en adelante.
+    """
+    rnd = random.Random(cfg.semilla)
+    hoy = datetime.date.today()
+    eventos = []
+
+    for i in range(cfg.eventos):
+        inicio = hoy + datetime.timedelta(days=rnd.randint(0, 365))
+        fin = inicio + datetime.timedelta(days=rnd.randint(0, 2))
+        ciudad, provincia = rnd.choice(CIUDADES)
+
+        eventos.append(
+            {
+                "id": i,
+                "nombre": f"{rnd.choice(CLUBES)} – Prueba de Agility {i}",
+                "inicio": inicio,
+                "fin": fin,
+                "ciudad": ciudad,
+                "provincia": provincia,
+                "anulado": rnd.random() < cfg.anulados,
+            }
+        )
+
+    # Copias del mismo evento tal y como llegan desde otros listados/enlaces.
+    copias = [
+        {**ev, "variante": True}
+        for ev in eventos
+        if rnd.random() < cfg.duplicados
+    ]
+
+    eventos = eventos + copias
+    eventos.sort(key=lambda e: e["inicio"])
+    return eventos
+
+
+def _fecha(d: datetime.date) -> str:
+    return f"{d.day} {MESES[d.month - 1]}, {d.year}"
+
+
+def render_tarjeta(ev: dict, host: str) -> str:
+    badge = '<span class="jet-listing-dynamic-terms__link">Anulado</span>' if ev["anulado"] else ""
+    url = f"http://{host}/evento/prueba-agility-{ev['id']}/"
+    nombre = ev["nombre"]
+
+    if ev.get("variante"):
+        url = url.rstrip("/") + "?utm_source=newsletter&utm_medium=email"
+        nombre = nombre.replace(" – ", " - ").replace("Prueba", "prueba")
+
+    return f"""
+<div class="jet-listing-grid__item" data-post-id="{ev['id']}">
+  <div class="elementor-widget-container">
+    <h2 class="elementor-heading-title"><a href="{url}">{html.escape(nombre)}</a></h2>
+    {badge}
+    <div class="jet-listing-dynamic-field__content">{_fecha(ev['inicio'])}</div>
+    <div class="jet-listing-dynamic-field__content">{_fecha(ev['fin'])}</div>
+    <h3 class="elementor-icon-box-title"><span>{html.escape(ev['ciudad'])}</span></h3>
+    <a class="elementor-button" href="{url}">Leer más</a>
+  </div>
+</div>"""
+
+
+def render_pagina(eventos: list, cfg: Config, pagina: int, host: str) -> str:
+    por_pagina = max(1, -(-len(eventos) // cfg.paginas))
+    trozo = eventos[(pagina - 1) * por_pagina: pagina * por_pagina] if pagina <= cfg.paginas else []
+
+    enlaces = "".join(
+        f'<div class="jet-filters-pagination__link">{n}</div>' for n in range(1, cfg.paginas + 1)
+    )
+    tarjetas = "".join(render_tarjeta(ev, host) for ev in trozo)
+
+    return f"""<!doctype html>
+<html lang="es-ES">
+<head><meta charset="utf-8"><title>Eventos RSCE</title></head>
+<body>
+<header><nav><a href="/">Inicio</a></nav></header>
+<main>
+  <input class="jet-date-range__from" value=""><input class="jet-date-range__to" value="">
+  <div class="jet-listing-grid"><div class="jet-listing-grid__items">{tarjetas}
+  </div></div>
+  <div class="jet-filters-pagination">{enlaces}</div>
+</main>
+</body>
+</html>"""
+
+
+def render_detalle(ev: dict) -> str:
+    """
+    Ficha de un evento. Uno de cada tres trae un mapa embebido con coordenadas.
+    """
+    rnd = random.Random(ev["id"])
+    club = ev["nombre"].split(" – ")[0]
+    jueces = ", ".join(rnd.sample(JUECES, 2))
+    mapa = ""
+
+    if ev["id"] % 3 == 0:
+        lat, lon = 36.0 + rnd.random() * 7, -9.0 + rnd.random() * 12
+        mapa = f'<iframe src="https://maps.google.com/maps?q={lat:.5f},{lon:.5f}&z=15&output=embed"></iframe>'
+
+    return f"""<!doctype html>
+<html lang="es-ES">
+<head><meta charset="utf-8"><title>{html.escape(ev['nombre'])}</title></head>
+<body>
+<main>
+  <h1>{html.escape(ev['nombre'])}</h1>
+  <ul>
+    <li><strong>Organizador:</strong> {html.escape(club)}</li>
+    <li><strong>Dirección:</strong> Pabellón Municipal, Calle Mayor {ev['id'] % 90 + 1}</li>
+    <li><strong>Jueces:</strong></li>
+    <li>{html.escape(jueces)}</li>
+    <li><strong>Grados:</strong> G1, G2, G3</li>
+  </ul>
+  {mapa}
+</main>
+</body>
+</html>"""
+
+
+def geocode_falso(q: str) -> list:
+    """
+    Respuesta tipo Nominatim con coordenadas deterministas dentro de España.
+    """
+    partes = [p.strip() for p in q.split(",") if p.strip() and p.strip().lower() != "españa"]
+    if not partes:
+        return []
+
+    h = int(hashlib.sha1(q.lower().encode("utf-8")).hexdigest()[:8], 16)
+    lat = 36.0 + (h % 7000) / 1000.0
+    lon = -9.0 + ((h // 7000) % 12000) / 1000.0
+    provincia = partes[1] if len(partes) > 1 else partes[0]
+
+    return [
+        {
+            "place_id": h,
+            "lat": f"{lat:.5f}",
+            "lon": f"{lon:.5f}",
+            "display_name": f"{partes[0]}, {provincia}, España",
+            "address": {"city": partes[0], "province": provincia, "country": "España", "country_code": "es"},
+            "boundingbox": [f"{lat - 0.05:.5f}", f"{lat + 0.05:.5f}", f"{lon - 0.05:.5f}", f"{lon + 0.05:.5f}"],
+        }
+    ]
+
+
+def photon_falso(q: str) -> dict:
+    """
+    Respuesta tipo Photon (FeatureCollection) con las mismas coordenadas.
+    """
+    features = []
+
+    for r in geocode_falso(q):
+        a = r["address"]
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(r["lon"]), float(r["lat"])]},
+                "properties": {"name": a["city"], "county": a["province"], "country": a["country"]},
+            }
+        )
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _sin_resultado(q: str, proporcion: float) -> bool:
+    h = int(hashlib.sha1(("vacia|" + q.lower()).encode("utf-8")).hexdigest()[:8], 16)
+    return h / 0xFFFFFFFF < proporcion
+
+
+def crear_servidor(cfg: Config, host: str = "127.0.0.1", puerto: int = 8765) -> ThreadingHTTPServer:
+    eventos = generar_eventos(cfg)
+    rnd = random.Random(cfg.semilla + 1)
+    lock = threading.Lock()
+    pagenum_re = re.compile(r"/pagenum/(\d+)/?$")
+    detalle_re = re.compile(r"^/evento/prueba-agility-(\d+)/?$")
+    por_id = {ev["id"]: ev for ev in eventos if not ev.get("variante")}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status: int, cuerpo: str, tipo: str, etag: str = ""):
+            datos = cuerpo.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            if etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            with lock:
+                espera = max(0.0, cfg.latencia + rnd.uniform(-cfg.jitter, cfg.jitter))
+                azar = rnd.random()
+            time.sleep(espera)
+
+            url = urlparse(self.path)
+            geocoder = url.path.rstrip("/") in ("/search", "/api")
+
+            if azar < (cfg.geocoder_errores if geocoder else cfg.errores):
+                self._responder(503, "Servicio no disponible (error inyectado)", "text/plain")
+                return
+
+            if url.path.rstrip("/") == "/search":
+                q = parse_qs(url.query).get("q", [""])[0]
+                res = [] if _sin_resultado(q, cfg.nominatim_vacias) else geocode_falso(q)
+                self._responder(200, json.dumps(res, ensure_ascii=False), "application/json")
+                return
+
+            if url.path.rstrip("/") == "/api":
+                q = parse_qs(url.query).get("q", [""])[0]
+                self._responder(200, json.dumps(photon_falso(q), ensure_ascii=False), "application/json")
+                return
+
+            m = detalle_re.match(url.path)
+            if m and int(m.group(1)) in por_id:
+                cuerpo = render_detalle(por_id[int(m.group(1))])
+                etag = '"' + hashlib.sha1(cuerpo.encode("utf-8")).hexdigest()[:16] + '"'
+
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self._responder(200, cuerpo, "text/html; charset=utf-8", etag)
+                return
+
+            if not url.path.startswith(cfg.prefijo):
+                self._responder(404, "No encontrado", "text/plain")
+                return
+
+            m = pagenum_re.search(url.path)
+            pagina = int(m.group(1)) if m else 1
+            host_hdr = self.headers.get("Host", f"{host}:{puerto}")
+            self._responder(200, render_pagina(eventos, cfg, pagina, host_hdr), "text/html; charset=utf-8")
+
+    return ThreadingHTTPServer((host, puerto), Handler)
+
+
+def arrancar_en_hilo(cfg: Config, host: str = "127.0.0.1", puerto: int = 0) -> ThreadingHTTPServer:
+    """
+    Arranca el servidor en segundo plano. Con puerto=0 elige uno libre
+    (consultable en srv.server_address).
+    """
+    srv = crear_servidor(cfg, host, puerto)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def _argumentos():
+    ap = argparse.ArgumentParser(description="Servidor local que imita el listado de eventos de RSCE")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--puerto", type=int, default=8765)
+    ap.add_argument("--paginas", type=int, default=Config.paginas)
+    ap.add_argument("--eventos", type=int, default=Config.eventos)
+    ap.add_argument("--latencia", type=float, default=Config.latencia, help="segundos por respuesta")
+    ap.add_argument("--jitter", type=float, default=Config.jitter, help="± segundos sobre la latencia")
+    ap.add_argument("--errores", type=float, default=Config.errores, help="probabilidad de 503 (0..1)")
+    ap.add_argument(
+        "--geocoder-errores", type=float, default=Config.geocoder_errores, help="probabilidad de 503 en /search y /api"
+    )
+    ap.add_argument("--anulados", type=float, default=Config.anulados, help="proporción de eventos anulados")
+    ap.add_argument("--duplicados", type=float, default=Config.duplicados, help="proporción de eventos repetidos")
+    ap.add_argument(
+        "--nominatim-vacias", type=float, default=Config.nominatim_vacias, help="proporción de consultas sin resultado"
+    )
+    ap.add_argument("--semilla", type=int, default=Config.semilla)
+    return ap.parse_args()
+
+
+def config_desde_args(args) -> Config:
+    return Config(
+        paginas=args.paginas,
+        eventos=args.eventos,
+        latencia=args.latencia,
+        jitter=args.jitter,
+        errores=args.errores,
+        geocoder_errores=args.geocoder_errores,
+        anulados=args.anulados,
+        duplicados=args.duplicados,
+        nominatim_vacias=args.nominatim_vacias,
+        semilla=args.semilla,
+    )
+
+
+if __name__ == "__main__":
+    args = _argumentos()
+    srv = crear_servidor(config_desde_args(args), args.host, args.puerto)
+    print(f"🧪 RSCE simulado en http://{args.host}:{args.puerto}/eventos-rsce/ (Ctrl+C para parar)")
+
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
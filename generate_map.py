@@ -1,10 +1,10 @@
-import csv, folium, os
+import csv, folium, os, json, hashlib, html, time, unicodedata
 from branca.element import Template, MacroElement
 
 csv_path = 'eventos_agility_2026.csv'
 out_path = 'mapa_agility_2026.html'
 
-m = folium.Map(location=[40.4168, -3.7038], zoom_start=6)
+t0 = time.perf_counter()
 
 colors = [
     'cadetblue', 'purple', 'green', 'darkblue', 'orange',
@@ -13,6 +13,58 @@ colors = [
     'gray', 'lightgray', 'blue'
 ]
 
+color_hex_map = {
+    'red': '#d33d2a', 'blue': '#38aadd', 'green': '#72b026', 'purple': '#d252b9',
+    'orange': '#f69730', 'darkred': '#a23336', 'lightred': '#ff8e7f', 'beige': '#ffcb92',
+    'darkblue': '#0067a3', 'darkgreen': '#728224', 'cadetblue': '#436978',
+    'darkpurple': '#5b396b', 'white': '#ffffff', 'pink': '#ff91ea', 'lightblue': '#8adaff',
+    'lightgreen': '#bbf970', 'gray': '#575757', 'black': '#303030', 'lightgray': '#a3a3a3'
+}
+
+def ciudad_de(row):
+    # Municipio canónico si el CSV lo trae; si no, el texto libre de Ciudad.
+    return (row.get('Municipio') or row.get('Ciudad') or '').strip()
+
+def color_de(ciudad):
+    # Color estable por ciudad (hash del nombre sin acentos): añadir una ciudad
+    # nueva no cambia el color de las demás.
+    t = unicodedata.normalize('NFKD', ciudad)
+    t = ''.join(ch for ch in t if not unicodedata.combining(ch)).lower().strip()
+    return colors[int(hashlib.sha1(t.encode('utf-8')).hexdigest(), 16) % len(colors)]
+
+def js_str(value):
+    # Cadena JS segura dentro de <script>.
+    return json.dumps(value, ensure_ascii=False).replace('</', '<\\/')
+
+def fragmento_marcador(row, ciudad, lat_f, lon_f, marker_color):
+    popup_html = f"""
+            <b>{html.escape(row.get('Nombre') or '')}</b><br>
+            Ciudad: {html.escape(ciudad)}<br>
+            Inicio: {html.escape(row.get('Fecha inicio') or '')}<br>
+            <a href='{html.escape(row.get('URL') or '', quote=True)}' target='_blank'>Más Info</a>
+            """
+    return (
+        f"L.marker([{lat_f}, {lon_f}], {{icon: L.AwesomeMarkers.icon("
+        f"{{icon: 'info-sign', iconColor: 'white', markerColor: {js_str(marker_color)}, prefix: 'glyphicon'}})}})"
+        f".bindPopup(L.popup({{maxWidth: 300}}).setContent({js_str(popup_html)}))"
+        f".bindTooltip({js_str(ciudad)}, {{sticky: true}})"
+        f".addTo(mapa);"
+    )
+
+def fragmento_leyenda(city, color):
+    hex_col = color_hex_map.get(color, '#38aadd')
+    return f"      <li><span style='background:{hex_col};'></span>{html.escape(city)}</li>\n"
+
+def fijar_ids(root):
+    # folium asigna ids aleatorios a cada elemento; con ids fijos el HTML es
+    # idéntico byte a byte si no cambian los datos.
+    pendientes, n = [root], 0
+    while pendientes:
+        el = pendientes.pop(0)
+        el._id = f'{n:04d}'
+        n += 1
+        pendientes.extend(getattr(el, '_children', {}).values())
+
 data_rows = []
 unique_cities = set()
 if os.path.exists(csv_path):
@@ -20,39 +72,42 @@ if os.path.exists(csv_path):
         reader = csv.DictReader(f)
         for row in reader:
             data_rows.append(row)
-            ciudad = row.get('Ciudad', '').strip()
+            ciudad = ciudad_de(row)
             if ciudad:
                 unique_cities.add(ciudad)
 
 cities_sorted = sorted(list(unique_cities))
-city_color_map = {}
-for i, city in enumerate(cities_sorted):
-    city_color_map[city] = colors[i % len(colors)]
+city_color_map = {city: color_de(city) for city in cities_sorted}
 
+m = folium.Map(location=[40.4168, -3.7038], zoom_start=6)
+
+fragmentos = []
 for row in data_rows:
     lat, lon = row.get('Latitud'), row.get('Longitud')
-    ciudad = row.get('Ciudad', '').strip()
+    ciudad = ciudad_de(row)
     if lat and lon and lat.strip() and lon.strip():
         try:
             lat_f = float(lat)
             lon_f = float(lon)
-            popup_html = f"""
-            <b>{row.get('Nombre')}</b><br>
-            Ciudad: {ciudad}<br>
-            Inicio: {row.get('Fecha inicio')}<br>
-            <a href='{row.get('URL')}' target='_blank'>Más Info</a>
-            """
-            
-            marker_color = city_color_map.get(ciudad, 'blue')
-            
-            folium.Marker(
-                [lat_f, lon_f],
-                popup=folium.Popup(popup_html, max_width=300),
-                tooltip=ciudad,
-                icon=folium.Icon(color=marker_color, icon='info-sign')
-            ).add_to(m)
         except ValueError:
-            pass
+            continue
+
+        marker_color = city_color_map.get(ciudad, 'blue')
+        fragmentos.append(fragmento_marcador(row, ciudad, lat_f, lon_f, marker_color))
+
+marcadores = MacroElement()
+marcadores._template = Template('''
+{% macro script(this, kwargs) %}
+(function() {
+  var mapa = {{ this._parent.get_name() }};
+{{ this.js }}
+})();
+{% endmacro %}
+''')
+marcadores.js = '\n'.join(fragmentos)
+m.add_child(marcadores)
+
+items_leyenda = ''.join(fragmento_leyenda(city, city_color_map[city]) for city in cities_sorted)
 
 legend_html = '''
 {% macro html(this, kwargs) %}
@@ -110,21 +165,7 @@ legend_html = '''
   <div class='legend-title'>Leyenda (Ciudad &harr; Color)</div>
   <div class='legend-scale'>
     <ul class='legend-labels'>
-'''
-
-for city in cities_sorted:
-    color = city_color_map[city]
-    color_hex_map = {
-        'red': '#d33d2a', 'blue': '#38aadd', 'green': '#72b026', 'purple': '#d252b9', 
-        'orange': '#f69730', 'darkred': '#a23336', 'lightred': '#ff8e7f', 'beige': '#ffcb92', 
-        'darkblue': '#0067a3', 'darkgreen': '#728224', 'cadetblue': '#436978', 
-        'darkpurple': '#5b396b', 'white': '#ffffff', 'pink': '#ff91ea', 'lightblue': '#8adaff', 
-        'lightgreen': '#bbf970', 'gray': '#575757', 'black': '#303030', 'lightgray': '#a3a3a3'
-    }
-    hex_col = color_hex_map.get(color, '#38aadd')
-    legend_html += f"      <li><span style='background:{hex_col};'></span>{city}</li>\n"
-
-legend_html += '''
+{{ this.items }}
     </ul>
   </div>
 </div>
@@ -135,7 +176,22 @@ legend_html += '''
 
 macro = MacroElement()
 macro._template = Template(legend_html)
+macro.items = items_leyenda
 m.get_root().add_child(macro)
 
-m.save(out_path)
-print('Map saved to', out_path)
+fijar_ids(m.get_root())
+contenido = m.get_root().render()
+
+anterior = None
+if os.path.exists(out_path):
+    with open(out_path, 'r', encoding='utf-8') as f:
+        anterior = f.read()
+
+if contenido != anterior:
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+    print('Map saved to', out_path)
+else:
+    print('Map unchanged:', out_path)
+
+print(f'{len(fragmentos)} markers, {len(cities_sorted)} cities, {1000 * (time.perf_counter() - t0):.1f} ms')
@@ -6,32 +6,78 @@ Scraper RSCE Agility -> CSV + GeoJSON (Lat/Lon + Estado)
 - Paginación robusta 1..N (o solo 1)
 - Geocodifica ciudades únicas (Nominatim) y añade Lat/Lon
 - Versión robusta: espera flexible + debug HTML/screenshot si falla
-Requisitos: selenium, webdriver-manager, beautifulsoup4, geopy, python-dotenv (opcional)
+- Imports perezosos: Selenium solo se carga en el fallback y geopy solo si GEOCODIFICAR
+- Métricas de arranque (desglose de imports) en metricas_run.json
+Requisitos: requests, beautifulsoup4, geopy (si GEOCODIFICAR), python-dotenv (opcional)
+Fallback navegador (opcional): selenium, webdriver-manager
 """
 
+import time
+
+# Marca de arranque: permite medir cuánto cuesta cargar el script (imports incluidos).
+_T0_ARRANQUE = time.perf_counter()
+
 import os
+import sys
 import csv
-import time
 import re
 import datetime
 import json
 import pathlib
-from typing import List, Tuple, Optional
-from bs4 import BeautifulSoup
-
-# Selenium
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
-
-# Geocoding
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
+import importlib
+import hashlib
+import gzip
+import unicodedata
+import difflib
+import threading
+import collections
+import urllib.parse
+import concurrent.futures
+import functools
+import contextlib
+from types import SimpleNamespace
+from typing import Dict, List, Tuple, Optional
+
+# Las dependencias pesadas (bs4, requests, selenium, webdriver_manager, geopy)
+# se cargan bajo demanda con _importar(): el camino directo por HTTP no paga
+# el coste de Selenium, y GEOCODIFICAR=false no carga geopy.
+_TIEMPOS_IMPORT = {}
+
+
+def _importar(nombre: str):
+    """
+    Importa un módulo solo cuando se necesita y anota cuánto tardó.
+    """
+    mod = sys.modules.get(nombre)
+    if mod is not None:
+        return mod
+
+    t0 = time.perf_counter()
+    mod = importlib.import_module(nombre)
+    _TIEMPOS_IMPORT[nombre] = round(time.perf_counter() - t0, 4)
+    return mod
+
+
+@functools.lru_cache(maxsize=None)
+def _selenium() -> SimpleNamespace:
+    """
+    Stack Selenium completo. Solo se usa en el fallback con navegador.
+    """
+    return SimpleNamespace(
+        webdriver=_importar("selenium.webdriver"),
+        By=_importar("selenium.webdriver.common.by").By,
+        ChromeService=_importar("selenium.webdriver.chrome.service").Service,
+        Options=_importar("selenium.webdriver.chrome.options").Options,
+        WebDriverWait=_importar("selenium.webdriver.support.ui").WebDriverWait,
+        EC=_importar("selenium.webdriver.support.expected_conditions"),
+        TimeoutException=_importar("selenium.common.exceptions").TimeoutException,
+        ChromeDriverManager=_importar("webdriver_manager.chrome").ChromeDriverManager,
+    )
+
+
+def _soup(html: str):
+    return _importar("bs4").BeautifulSoup(html, "html.parser")
+
 
 # .env (opcional)
 try:
@@ -40,6 +86,9 @@ try:
 except Exception:
     pass
 
+# Coste de los imports del propio módulo (stdlib + dotenv), sin dependencias pesadas.
+_TIEMPOS_IMPORT["<modulo>"] = round(time.perf_counter() - _T0_ARRANQUE, 4)
+
 
 # =========================
 # Fechas (ES)
@@ -89,6 +138,1424 @@ def parse_date_range(inicio: str, fin: str) -> Tuple[Optional[datetime.date], Op
     return parse_spanish_date(inicio), parse_spanish_date(fin)
 
 
+# =========================
+# Ubicaciones (normalización)
+# =========================
+PROVINCIAS = {
+    "a coruna": "A Coruña", "la coruna": "A Coruña", "coruna": "A Coruña",
+    "alava": "Álava", "araba": "Álava",
+    "albacete": "Albacete",
+    "alicante": "Alicante", "alacant": "Alicante",
+    "almeria": "Almería",
+    "asturias": "Asturias",
+    "avila": "Ávila",
+    "badajoz": "Badajoz",
+    "barcelona": "Barcelona",
+    "burgos": "Burgos",
+    "caceres": "Cáceres",
+    "cadiz": "Cádiz",
+    "cantabria": "Cantabria",
+    "castellon": "Castellón", "castello": "Castellón",
+    "ciudad real": "Ciudad Real",
+    "cordoba": "Córdoba",
+    "cuenca": "Cuenca",
+    "girona": "Girona", "gerona": "Girona",
+    "granada": "Granada",
+    "guadalajara": "Guadalajara",
+    "gipuzkoa": "Gipuzkoa", "guipuzcoa": "Gipuzkoa",
+    "huelva": "Huelva",
+    "huesca": "Huesca",
+    "illes balears": "Illes Balears", "islas baleares": "Illes Balears", "baleares": "Illes Balears",
+    "jaen": "Jaén",
+    "la rioja": "La Rioja", "rioja": "La Rioja",
+    "las palmas": "Las Palmas",
+    "leon": "León",
+    "lleida": "Lleida", "lerida": "Lleida",
+    "lugo": "Lugo",
+    "madrid": "Madrid", "comunidad de madrid": "Madrid",
+    "malaga": "Málaga",
+    "murcia": "Murcia", "region de murcia": "Murcia",
+    "navarra": "Navarra", "nafarroa": "Navarra",
+    "ourense": "Ourense", "orense": "Ourense",
+    "palencia": "Palencia",
+    "pontevedra": "Pontevedra",
+    "salamanca": "Salamanca",
+    "santa cruz de tenerife": "Santa Cruz de Tenerife", "tenerife": "Santa Cruz de Tenerife",
+    "segovia": "Segovia",
+    "sevilla": "Sevilla",
+    "soria": "Soria",
+    "tarragona": "Tarragona",
+    "teruel": "Teruel",
+    "toledo": "Toledo",
+    "valencia": "Valencia", "valencia valencia": "Valencia",
+    "valladolid": "Valladolid",
+    "bizkaia": "Bizkaia", "vizcaya": "Bizkaia",
+    "zamora": "Zamora",
+    "zaragoza": "Zaragoza",
+    "ceuta": "Ceuta",
+    "melilla": "Melilla",
+}
+
+# Palabras con las que suele empezar el nombre de una instalación, no de un municipio.
+PALABRAS_RECINTO = (
+    "pabellon", "polideportivo", "pista", "pistas", "campo", "club", "finca",
+    "recinto", "instalaciones", "centro", "complejo", "parque", "hipica",
+    "picadero", "nave", "estadio", "ciudad deportiva", "residencia", "hotel",
+    "camping", "escuela", "ferial", "feria", "circuito", "cd", "c d", "ca", "c a",
+)
+
+SEPARADORES_UBICACION = re.compile(r"\s*(?:,|;|\||·|/|\s[-–—]\s)\s*")
+
+
+def slug_texto(txt: str) -> str:
+    """
+    Minúsculas, sin acentos ni puntuación y con espacios simples.
+    """
+    t = unicodedata.normalize("NFKD", txt or "")
+    t = "".join(ch for ch in t if not unicodedata.combining(ch)).lower()
+    t = re.sub(r"[^a-z0-9 ]+", " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+
+def provincia_canonica(txt: str) -> str:
+    return PROVINCIAS.get(slug_texto(txt), "")
+
+
+def _es_recinto(slug: str) -> bool:
+    return any(slug == p or slug.startswith(p + " ") for p in PALABRAS_RECINTO)
+
+
+# Palabras que acompañan al tipo de recinto sin nombrar ningún sitio.
+CALIFICATIVOS_RECINTO = {
+    "municipal", "municipales", "deportes", "deportivo", "deportiva", "cubierto",
+    "cubierta", "polivalente", "canino", "canina", "de", "del", "la", "el", "los", "las", "y",
+}
+
+
+def _recinto_generico(slug: str) -> bool:
+    """
+    'pabellon municipal' -> True; 'campo real', 'ca n picafort' -> False.
+    """
+    palabras = set(slug.split()) - CALIFICATIVOS_RECINTO
+    return not (palabras - {p for p in PALABRAS_RECINTO if " " not in p})
+
+
+def _municipio_de_recinto(parte: str) -> str:
+    """
+    Municipio a partir de un trozo con pinta de recinto, o "" si es genérico.
+    'Polideportivo Municipal de Tres Cantos' -> 'Tres Cantos', pero
+    'Campo de Criptana' y 'Campo Real' son municipios y se devuelven tal cual.
+    """
+    trozos = re.split(r"\s+de\s+", parte, flags=re.I)
+
+    if len(trozos) > 1:
+        prefijo = slug_texto(" de ".join(trozos[:-1]))
+        if prefijo not in PALABRAS_RECINTO and _recinto_generico(prefijo):
+            return trozos[-1]
+
+    return "" if _recinto_generico(slug_texto(parte)) else parte
+
+
+def normalizar_ubicacion(raw: str) -> Tuple[str, str]:
+    """
+    Texto libre de ubicación -> (municipio, provincia).
+
+    - Quita provincias entre paréntesis: 'Alcalá de Henares (Madrid)'
+    - Descarta trozos que son nombres de recinto si queda otro trozo que no es
+      provincia: 'Pabellón Municipal, Cuarte'
+    - Reconoce la provincia si aparece como trozo suelto: 'Cuarte, Zaragoza'
+    - Muchos municipios empiezan como un recinto ('Campo Real', "Ca'n Picafort"):
+      si no hay otro trozo, se conserva el texto salvo que sea genérico.
+    Si solo queda una provincia, es la capital: 'Zaragoza' -> (Zaragoza, Zaragoza).
+
+    >>> normalizar_ubicacion("Cuarte de Huerva (Zaragoza)")
+    ('Cuarte de Huerva', 'Zaragoza')
+    >>> normalizar_ubicacion("Pabellón Municipal, Cuarte de Huerva")
+    ('Cuarte de Huerva', '')
+    >>> normalizar_ubicacion("Madrid, Alcalá de Henares")
+    ('Alcalá de Henares', 'Madrid')
+    >>> normalizar_ubicacion("Polideportivo Municipal de Tres Cantos")
+    ('Tres Cantos', '')
+    >>> normalizar_ubicacion("Pabellón Municipal, Zaragoza")
+    ('Zaragoza', 'Zaragoza')
+    >>> normalizar_ubicacion("Campo Real (Madrid)")
+    ('Campo Real', 'Madrid')
+    >>> normalizar_ubicacion("Campo de Criptana")
+    ('Campo de Criptana', '')
+    >>> normalizar_ubicacion("Ca'n Picafort")
+    ("Ca'n Picafort", '')
+    >>> normalizar_ubicacion("Finca Los Olivos · Alhaurín de la Torre")
+    ('Alhaurín de la Torre', '')
+    """
+    t = re.sub(r"\s+", " ", raw or "").strip()
+    t = re.sub(r"\bleer m[aá]s\b", "", t, flags=re.I).strip()
+
+    provincia = ""
+
+    for dentro in re.findall(r"\(([^)]*)\)", t):
+        provincia = provincia or provincia_canonica(dentro)
+    t = re.sub(r"\([^)]*\)", " ", t)
+
+    otros, recintos, provincias = [], [], []
+
+    for parte in SEPARADORES_UBICACION.split(t):
+        parte = parte.strip(" .:-")
+        slug = slug_texto(parte)
+
+        if not slug:
+            continue
+
+        if provincia_canonica(parte):
+            provincias.append(parte)
+        elif _es_recinto(slug):
+            recintos.append(parte)
+        else:
+            otros.append(parte)
+
+    if provincias:
+        provincia = provincia or provincia_canonica(provincias[0])
+
+    if otros:
+        municipio = otros[0]
+    elif recintos:
+        municipio = _municipio_de_recinto(recintos[-1])
+        if not municipio:
+            # Recinto genérico: la capital si hay provincia, si no el texto tal cual.
+            municipio = provincias[0] if provincias else recintos[-1]
+    elif provincias:
+        municipio = provincias[0]
+    else:
+        municipio = ""
+
+    if municipio and not provincia:
+        provincia = provincia_canonica(municipio)
+
+    if municipio.isupper() or municipio.islower():
+        municipio = municipio.title()
+
+    return municipio.strip(), provincia
+
+
+def clave_ubicacion(municipio: str, provincia: str) -> str:
+    return f"{slug_texto(municipio)}|{slug_texto(provincia)}" if municipio else ""
+
+
+class _IndiceUbicaciones:
+    """
+    Índice canónico de ubicaciones persistido en JSON:
+    - alias: texto original (normalizado) -> clave canónica 'municipio|provincia'
+    - ubicaciones: clave -> municipio, provincia y coordenadas ya geocodificadas
+
+    Las entradas con "manual": true no se sobrescriben nunca, así que el fichero
+    puede corregirse a mano.
+    """
+
+    # Los fallos de geocodificación se reintentan pasados estos días.
+    DIAS_REINTENTO = 7
+
+    # Cambia cuando cambian las reglas de normalizar_ubicacion: los alias
+    # calculados con reglas anteriores se descartan (las coordenadas no).
+    VERSION_ALIAS = 2
+
+    def __init__(self, ruta: pathlib.Path):
+        self.ruta = ruta
+        self.cambiado = False
+
+        try:
+            datos = json.loads(ruta.read_text(encoding="utf-8"))
+        except Exception:
+            datos = {}
+
+        self.alias = datos.get("alias", {})
+        self.ubicaciones = datos.get("ubicaciones", {})
+
+        if datos and datos.get("version_alias") != self.VERSION_ALIAS:
+            self.alias = {}
+            self.cambiado = True
+        # Direcciones exactas de recintos (de las páginas de detalle) -> coordenadas
+        self.direcciones = datos.get("direcciones", {})
+
+    def _con_provincia(self, clave: str) -> str:
+        """
+        'cuarte|' -> 'cuarte|zaragoza' si ese municipio solo se conoce en una provincia.
+        """
+        municipio = clave.split("|", 1)[0]
+        opciones = [k for k in self.ubicaciones if k.startswith(municipio + "|") and not k.endswith("|")]
+        return opciones[0] if len(opciones) == 1 else clave
+
+    def resolver(self, raw: str) -> dict:
+        """
+        Devuelve la entrada canónica (con su 'clave') para un texto de ubicación.
+        """
+        alias = slug_texto(raw)
+        if not alias:
+            return {}
+
+        clave = self.alias.get(alias)
+
+        if clave is None:
+            municipio, provincia = normalizar_ubicacion(raw)
+            clave = clave_ubicacion(municipio, provincia)
+
+            if not clave:
+                return {}
+
+            if clave.endswith("|"):
+                clave = self._con_provincia(clave)
+
+            self.ubicaciones.setdefault(clave, {"municipio": municipio, "provincia": provincia})
+            self.alias[alias] = clave
+            self.cambiado = True
+
+        return {"clave": clave, **self.ubicaciones.get(clave, {})}
+
+    def pendiente(self, clave: str) -> bool:
+        """
+        True si la clave aún no tiene coordenadas (o su fallo ya caducó).
+        """
+        u = self.ubicaciones.get(clave, {})
+
+        if u.get("lat") is not None or u.get("manual"):
+            return False
+
+        fallo = u.get("fallo")
+        if not fallo:
+            return True
+
+        try:
+            dias = (datetime.date.today() - datetime.date.fromisoformat(fallo)).days
+        except ValueError:
+            return True
+
+        return dias >= self.DIAS_REINTENTO
+
+    def fijar(self, clave: str, lat, lon, provincia: str = "", fuente: str = "") -> str:
+        """
+        Guarda el resultado de geocodificar una clave. Si la clave no tenía
+        provincia y el geocoder la aporta, se reubica en 'municipio|provincia'
+        y se devuelve la clave nueva.
+        """
+        u = self.ubicaciones.setdefault(clave, {})
+
+        if u.get("manual"):
+            return clave
+
+        if lat is None or lon is None:
+            u["fallo"] = datetime.date.today().isoformat()
+        else:
+            u.update({"lat": lat, "lon": lon, "fuente": fuente})
+            u.pop("fallo", None)
+
+        self.cambiado = True
+
+        if provincia and clave.endswith("|"):
+            nueva = clave + slug_texto(provincia)
+            destino = self.ubicaciones.setdefault(nueva, {})
+            for k, v in u.items():
+                destino.setdefault(k, v)
+            destino["provincia"] = destino.get("provincia") or provincia
+            del self.ubicaciones[clave]
+            self.alias = {a: (nueva if k == clave else k) for a, k in self.alias.items()}
+            return nueva
+
+        if provincia and not u.get("provincia"):
+            u["provincia"] = provincia
+
+        return clave
+
+    @staticmethod
+    def clave_direccion(direccion: str, municipio: str) -> str:
+        return slug_texto(f"{direccion} {municipio}")
+
+    def direccion_pendiente(self, clave: str) -> bool:
+        d = self.direcciones.get(clave)
+        if d is None:
+            return True
+        if d.get("lat") is not None or not d.get("fallo"):
+            return False
+        try:
+            return (datetime.date.today() - datetime.date.fromisoformat(d["fallo"])).days >= self.DIAS_REINTENTO
+        except ValueError:
+            return True
+
+    def fijar_direccion(self, clave: str, lat, lon, fuente: str = ""):
+        if lat is None or lon is None:
+            self.direcciones[clave] = {"fallo": datetime.date.today().isoformat()}
+        else:
+            self.direcciones[clave] = {"lat": lat, "lon": lon, "fuente": fuente}
+        self.cambiado = True
+
+    def guardar(self):
+        if not self.cambiado:
+            return
+
+        try:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            datos = {
+                "version_alias": self.VERSION_ALIAS,
+                "alias": self.alias,
+                "ubicaciones": self.ubicaciones,
+                "direcciones": self.direcciones,
+            }
+            self.ruta.write_text(json.dumps(datos, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+            self.cambiado = False
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el índice de ubicaciones: {e}")
+
+
+# =========================
+# Duplicados
+# =========================
+# Parámetros de seguimiento que no identifican el evento.
+PARAMS_SEGUIMIENTO = re.compile(r"^(utm_\w+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga|_gl|ref|source)$", re.I)
+
+
+def canonizar_url(url: str) -> str:
+    """
+    'HTTPS://www.rsce.es/eventos-rsce/x/?utm_source=fb#top' -> 'rsce.es/eventos-rsce/x'
+    (sin esquema, www, fragmento, parámetros de seguimiento ni barra final).
+    """
+    if not url:
+        return ""
+
+    partes = urllib.parse.urlsplit(url.strip())
+    host = partes.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    query = sorted(
+        (k, v)
+        for k, v in urllib.parse.parse_qsl(partes.query, keep_blank_values=True)
+        if not PARAMS_SEGUIMIENTO.match(k)
+    )
+    ruta = partes.path.rstrip("/")
+
+    return host + ruta + ("?" + urllib.parse.urlencode(query) if query else "")
+
+
+def clave_evento(nombre: str, inicio: str, url: str, ciudad: str) -> str:
+    """
+    Identidad estable de un evento: su URL canónica o, sin URL, nombre+inicio+ciudad.
+    """
+    return canonizar_url(url) or slug_texto(f"{nombre}|{inicio}|{ciudad}")
+
+
+class _IndiceDuplicados:
+    """
+    Índice único de eventos ya vistos en el run (todas las páginas y fuentes).
+
+    Un evento es duplicado si:
+    - su URL canónica ya está en el índice, o
+    - en su bloque (fecha de inicio + municipio canónico) hay otro con la misma
+      fecha de fin y un título casi igual (SequenceMatcher >= UMBRAL_TITULO) que
+      no difiere en ningún número ("Agility 1" no es "Agility 2").
+
+    Los bloques son diminutos, así que el coste es casi lineal en el número de
+    eventos. Cada fusión queda registrada en 'fusiones' para el informe.
+    """
+
+    UMBRAL_TITULO = 0.9
+
+    def __init__(self):
+        self.urls = {}
+        self.bloques = {}
+        self.fusiones = []
+        self.n = 0
+
+    @staticmethod
+    def _bloque(ev) -> str:
+        nombre, inicio, fin, url, ciudad, estado = ev
+        di = parse_spanish_date(inicio)
+        municipio, _ = normalizar_ubicacion(ciudad)
+        return f"{di.isoformat() if di else slug_texto(inicio)}|{slug_texto(municipio)}"
+
+    @staticmethod
+    def _titulo(nombre: str) -> Tuple[str, Tuple[str, ...]]:
+        t = slug_texto(nombre)
+        return t, tuple(re.findall(r"\d+", t))
+
+    def _buscar(self, ev) -> Tuple[Optional[tuple], str, float]:
+        """
+        (evento_conservado, motivo, similitud) del duplicado de 'ev', o (None, "", 0).
+        """
+        url = canonizar_url(ev[3])
+        if url and url in self.urls:
+            return self.urls[url], "url", 1.0
+
+        titulo, numeros = self._titulo(ev[0])
+        mejor = (None, "", 0.0)
+
+        for otro, otro_titulo, otro_numeros in self.bloques.get(self._bloque(ev), ()):
+            if otro[2] != ev[2] or otro_numeros != numeros:
+                continue
+
+            if otro_titulo == titulo:
+                return otro, "titulo", 1.0
+
+            sm = difflib.SequenceMatcher(None, titulo, otro_titulo)
+            if sm.real_quick_ratio() < self.UMBRAL_TITULO or sm.quick_ratio() < self.UMBRAL_TITULO:
+                continue
+
+            r = sm.ratio()
+            if r >= self.UMBRAL_TITULO and r > mejor[2]:
+                mejor = (otro, "titulo", r)
+
+        return mejor
+
+    def visto(self, ev) -> bool:
+        return self._buscar(ev)[0] is not None
+
+    def registrar(self, ev) -> bool:
+        """
+        Añade 'ev' al índice. Devuelve False (y anota la fusión) si es duplicado.
+        """
+        self.n += 1
+        conservado, motivo, similitud = self._buscar(ev)
+
+        if conservado is not None:
+            self.fusiones.append(
+                {
+                    "motivo": motivo,
+                    "similitud": round(similitud, 3),
+                    "conservado": {"nombre": conservado[0], "inicio": conservado[1], "url": conservado[3]},
+                    "descartado": {"nombre": ev[0], "inicio": ev[1], "url": ev[3]},
+                }
+            )
+            # La URL alternativa también apunta al evento conservado.
+            url = canonizar_url(ev[3])
+            if url:
+                self.urls.setdefault(url, conservado)
+            return False
+
+        url = canonizar_url(ev[3])
+        if url:
+            self.urls[url] = ev
+
+        titulo, numeros = self._titulo(ev[0])
+        self.bloques.setdefault(self._bloque(ev), []).append((ev, titulo, numeros))
+        return True
+
+    def resumen(self) -> dict:
+        motivos = collections.Counter(f["motivo"] for f in self.fusiones)
+        return {"vistos": self.n, "unicos": self.n - len(self.fusiones), "fusionados": dict(motivos)}
+
+
+# =========================
+# Histórico (SQLite)
+# =========================
+class _HistoricoEventos:
+    """
+    Archivo de todos los eventos vistos alguna vez, en SQLite:
+    - eventos: una fila por evento (nunca se borra) con primera_vez/ultima_vez
+    - estados: transiciones de estado, solo se añaden filas (Activo -> Anulado...)
+    - ejecuciones: un resumen por run
+
+    Cada run se guarda en una única transacción. Solo toca las filas de los
+    eventos del run (vía clave primaria), así que no se ralentiza al crecer.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS eventos (
+            id TEXT PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            inicio TEXT,
+            fin TEXT,
+            inicio_txt TEXT,
+            fin_txt TEXT,
+            url TEXT,
+            ciudad TEXT,
+            municipio TEXT,
+            provincia TEXT,
+            estado TEXT NOT NULL,
+            primera_vez TEXT NOT NULL,
+            ultima_vez TEXT NOT NULL,
+            ultima_ejecucion INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS estados (
+            evento_id TEXT NOT NULL REFERENCES eventos(id),
+            estado TEXT NOT NULL,
+            desde TEXT NOT NULL,
+            ejecucion INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS ejecuciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT NOT NULL,
+            eventos INTEGER NOT NULL,
+            nuevos INTEGER NOT NULL,
+            cambios_estado INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_eventos_inicio ON eventos(inicio);
+        CREATE INDEX IF NOT EXISTS ix_eventos_provincia ON eventos(provincia, inicio);
+        CREATE INDEX IF NOT EXISTS ix_eventos_estado ON eventos(estado, inicio);
+        CREATE INDEX IF NOT EXISTS ix_estados_evento ON estados(evento_id, desde);
+    """
+
+    COLUMNAS = (
+        "id", "nombre", "inicio", "fin", "inicio_txt", "fin_txt",
+        "url", "ciudad", "municipio", "provincia", "estado",
+    )
+
+    def __init__(self, ruta: pathlib.Path):
+        self.ruta = ruta
+        self.lote = {}
+
+    @staticmethod
+    def id_evento(ev) -> str:
+        nombre, inicio, fin, url, ciudad, estado = ev
+        return clave_evento(nombre, inicio, url, ciudad)
+
+    def anotar(self, ev):
+        self.lote[self.id_evento(ev)] = ev
+
+    def _filas(self, resolver):
+        for id_, ev in self.lote.items():
+            nombre, inicio, fin, url, ciudad, estado = ev
+            di, df = parse_date_range(inicio, fin)
+            u = resolver(ciudad) if resolver else {}
+
+            yield (
+                id_,
+                nombre,
+                di.isoformat() if di else None,
+                df.isoformat() if df else None,
+                inicio,
+                fin,
+                url,
+                ciudad,
+                u.get("municipio", ""),
+                u.get("provincia", ""),
+                estado,
+            )
+
+    def guardar(self, resolver=None) -> Optional[dict]:
+        """
+        Vuelca el lote del run en una transacción. Devuelve el resumen del run.
+        'resolver' (texto de ciudad -> {municipio, provincia}) se aplica al final,
+        cuando la geocodificación del run ya ha completado el índice.
+        """
+        if not self.lote:
+            return None
+
+        sqlite3 = _importar("sqlite3")
+        ahora = datetime.datetime.now().isoformat(timespec="seconds")
+        columnas = ", ".join(self.COLUMNAS)
+        marcas = ", ".join("?" for _ in self.COLUMNAS)
+        # Una ubicación sin resolver en este run no borra la ya conocida.
+        actualizar = ", ".join(
+            f"{c} = COALESCE(NULLIF(excluded.{c}, ''), eventos.{c})" if c in ("municipio", "provincia")
+            else f"{c} = excluded.{c}"
+            for c in self.COLUMNAS[1:]
+        )
+
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.ruta))
+
+        try:
+            con.executescript(self.ESQUEMA)
+
+            with con:
+                con.execute(f"CREATE TEMP TABLE lote ({columnas})")
+                con.executemany(f"INSERT INTO temp.lote VALUES ({marcas})", self._filas(resolver))
+
+                nuevos, cambios = con.execute(
+                    """
+                    SELECT COUNT(*) FILTER (WHERE e.id IS NULL),
+                           COUNT(*) FILTER (WHERE e.id IS NOT NULL AND e.estado != l.estado)
+                    FROM temp.lote l LEFT JOIN eventos e ON e.id = l.id
+                    """
+                ).fetchone()
+
+                ejecucion = con.execute(
+                    "INSERT INTO ejecuciones (fecha, eventos, nuevos, cambios_estado) VALUES (?, ?, ?, ?)",
+                    (ahora, len(self.lote), nuevos, cambios),
+                ).lastrowid
+
+                con.execute(
+                    """
+                    INSERT INTO estados (evento_id, estado, desde, ejecucion)
+                    SELECT l.id, l.estado, ?, ?
+                    FROM temp.lote l LEFT JOIN eventos e ON e.id = l.id
+                    WHERE e.id IS NULL OR e.estado != l.estado
+                    """,
+                    (ahora, ejecucion),
+                )
+
+                con.execute(
+                    f"""
+                    INSERT INTO eventos ({columnas}, primera_vez, ultima_vez, ultima_ejecucion)
+                    SELECT {columnas}, ?, ?, ? FROM temp.lote WHERE true
+                    ON CONFLICT(id) DO UPDATE SET {actualizar},
+                        ultima_vez = excluded.ultima_vez,
+                        ultima_ejecucion = excluded.ultima_ejecucion
+                    """,
+                    (ahora, ahora, ejecucion),
+                )
+
+                con.execute("DROP TABLE temp.lote")
+
+            total = con.execute("SELECT COUNT(*) FROM eventos").fetchone()[0]
+        finally:
+            con.close()
+
+        self.lote = {}
+        return {"ejecucion": ejecucion, "nuevos": nuevos, "cambios_estado": cambios, "total": total}
+
+
+# =========================
+# Salidas (streaming)
+# =========================
+def _sha256_fichero(ruta: str) -> Optional[str]:
+    try:
+        h = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 16), b""):
+                h.update(bloque)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+
+class _LimiteFicheros:
+    """
+    Tope de ficheros abiertos a la vez entre muchas salidas (shards, feeds).
+    Al pasar de 'maximo' se cierra el usado hace más tiempo; la salida lo
+    reabre en modo 'a' la próxima vez que escribe.
+    """
+
+    def __init__(self, maximo: int):
+        self.maximo = max(1, maximo)
+        self.abiertos = collections.OrderedDict()
+
+    def usar(self, salida: "_SalidaArchivo"):
+        self.abiertos[id(salida)] = salida
+        self.abiertos.move_to_end(id(salida))
+
+        while len(self.abiertos) > self.maximo:
+            _, viejo = self.abiertos.popitem(last=False)
+            viejo.suspender()
+
+    def soltar(self, salida: "_SalidaArchivo"):
+        self.abiertos.pop(id(salida), None)
+
+
+class _SalidaArchivo:
+    """
+    Fichero de salida escrito en streaming sobre '<ruta>.part'.
+    Al cerrar con éxito se publica con os.replace; si el run falla se descarta
+    y la versión anterior del fichero queda intacta.
+    Si el contenido no ha cambiado no se toca el fichero publicado (mismo mtime,
+    misma ETag en el servidor web).
+    Con un _LimiteFicheros el fichero puede cerrarse entre escrituras.
+    """
+
+    def __init__(
+        self,
+        ruta: str,
+        newline: Optional[str] = None,
+        silencioso: bool = False,
+        limite: Optional[_LimiteFicheros] = None,
+    ):
+        self.ruta = ruta
+        self.tmp = ruta + ".part"
+        self.n = 0
+        self.silencioso = silencioso
+        self.sha256 = None
+        self.cambiado = False
+        self.newline = newline
+        self.limite = limite
+
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._abrir("w")
+
+    def _abrir(self, modo: str):
+        self._f = open(self.tmp, modo, encoding="utf-8", newline=self.newline)
+        self._al_abrir()
+        if self.limite is not None:
+            self.limite.usar(self)
+
+    def _al_abrir(self):
+        pass
+
+    @property
+    def f(self):
+        if self._f.closed:
+            self._abrir("a")
+        elif self.limite is not None:
+            self.limite.usar(self)
+        return self._f
+
+    def suspender(self):
+        self._f.close()
+
+    def escribir(self, r: dict):
+        raise NotImplementedError
+
+    def _pie(self):
+        pass
+
+    def cerrar(self, ok: bool = True):
+        try:
+            if ok:
+                self._pie()
+        finally:
+            self._f.close()
+            if self.limite is not None:
+                self.limite.soltar(self)
+
+        if ok:
+            self.sha256 = _sha256_fichero(self.tmp)
+            self.cambiado = self.sha256 != _sha256_fichero(self.ruta)
+
+        if ok and self.cambiado:
+            os.replace(self.tmp, self.ruta)
+        else:
+            try:
+                os.remove(self.tmp)
+            except OSError:
+                pass
+
+    def _aviso(self, texto: str):
+        if not self.silencioso:
+            print(texto + ("" if self.cambiado else " (sin cambios)"))
+
+
+class _SalidaCSV(_SalidaArchivo):
+    COLUMNAS = [
+        "Nombre",
+        "Fecha inicio",
+        "Fecha fin",
+        "URL",
+        "Ciudad",
+        "Estado",
+        "Latitud",
+        "Longitud",
+        "Municipio",
+        "Provincia",
+        "Organizador",
+        "Direccion",
+        "Jueces",
+        "Grados",
+    ]
+
+    def __init__(self, ruta: str, **kw):
+        super().__init__(ruta, newline="", **kw)
+        self.w.writerow(self.COLUMNAS)
+
+    def _al_abrir(self):
+        self.w = csv.writer(self._f)
+
+    def escribir(self, r: dict):
+        f = self.f
+        self.w.writerow(
+            [
+                r["nombre"],
+                r["inicio"],
+                r["fin"],
+                r["url"],
+                r["ciudad"],
+                r["estado"],
+                r["lat"],
+                r["lon"],
+                r.get("municipio", ""),
+                r.get("provincia", ""),
+                r.get("organizador", ""),
+                r.get("direccion", ""),
+                r.get("jueces", ""),
+                r.get("grados", ""),
+            ]
+        )
+        f.flush()
+        self.n += 1
+
+    def cerrar(self, ok: bool = True):
+        super().cerrar(ok)
+        if ok:
+            self._aviso(f"📁 CSV guardado en: {self.ruta} con {self.n} eventos")
+
+
+class _SalidaGeoJSON(_SalidaArchivo):
+    """
+    FeatureCollection escrita feature a feature (sin tenerla entera en memoria).
+    Solo incluye registros con coordenadas válidas.
+    """
+
+    def __init__(self, ruta: str, **kw):
+        super().__init__(ruta, **kw)
+        self.f.write('{\n  "type": "FeatureCollection",\n  "features": [')
+
+    @staticmethod
+    def feature(r: dict) -> Optional[dict]:
+        lat, lon = r.get("lat"), r.get("lon")
+
+        try:
+            if lat is None or lon is None:
+                return None
+            coords = [float(lon), float(lat)]
+        except (TypeError, ValueError):
+            return None
+
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": coords,
+            },
+            "properties": {
+                "nombre": r["nombre"],
+                "inicio": r["inicio"],
+                "fin": r["fin"],
+                "ciudad": r["ciudad"],
+                "municipio": r.get("municipio", ""),
+                "provincia": r.get("provincia", ""),
+                "estado": r["estado"],
+                "url": r["url"],
+                "organizador": r.get("organizador", ""),
+                "direccion": r.get("direccion", ""),
+                "jueces": r.get("jueces", ""),
+                "grados": r.get("grados", ""),
+            },
+        }
+
+    def escribir(self, r: dict):
+        feat = self.feature(r)
+        if feat is None:
+            return
+
+        txt = json.dumps(feat, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+        self.f.write(("," if self.n else "") + "\n    " + txt)
+        self.f.flush()
+        self.n += 1
+
+    def _pie(self):
+        self.f.write("\n  ]\n}" if self.n else "]\n}")
+
+    def cerrar(self, ok: bool = True):
+        super().cerrar(ok)
+        if ok:
+            self._aviso(f"🧭 GeoJSON guardado en: {self.ruta} ({self.n} features)")
+
+
+class _SalidaShards:
+    """
+    Salidas particionadas por mes (de inicio) y por provincia:
+        <dir>/mes/2026-03.geojson|csv
+        <dir>/provincia/zaragoza.geojson|csv
+        <dir>/indice.json   (bbox, rango de fechas y hashes de cada shard)
+
+    Cada shard se escribe en streaming y solo se publica si su contenido cambia,
+    así que una subida diaria solo tiene que copiar los shards cuyo hash difiere.
+    Los shards que se quedan sin eventos se borran.
+    """
+
+    def __init__(self, directorio: str, limite: Optional[_LimiteFicheros] = None):
+        self.dir = directorio
+        self.indice_path = os.path.join(directorio, "indice.json")
+        self.shards = {}
+        self.limite = limite
+
+    @staticmethod
+    def claves(r: dict) -> List[Tuple[str, str, str]]:
+        """
+        (tipo, clave, nombre) de los shards a los que pertenece un registro.
+        """
+        di = parse_spanish_date(r["inicio"])
+        mes = di.strftime("%Y-%m") if di else "sin-fecha"
+        provincia = r.get("provincia", "")
+        prov_slug = slug_texto(provincia).replace(" ", "-") or "sin-provincia"
+
+        return [
+            ("mes", mes, mes),
+            ("provincia", prov_slug, provincia or "Sin provincia"),
+        ]
+
+    def _shard(self, tipo: str, clave: str, nombre: str) -> dict:
+        sid = f"{tipo}/{clave}"
+        sh = self.shards.get(sid)
+
+        if sh is None:
+            base = os.path.join(self.dir, tipo, clave)
+            sh = self.shards[sid] = {
+                "id": sid,
+                "tipo": tipo,
+                "clave": clave,
+                "nombre": nombre,
+                "csv": _SalidaCSV(base + ".csv", silencioso=True, limite=self.limite),
+                "geojson": _SalidaGeoJSON(base + ".geojson", silencioso=True, limite=self.limite),
+                "bbox": None,
+                "desde": None,
+                "hasta": None,
+            }
+
+        return sh
+
+    def escribir(self, r: dict):
+        di, df = parse_date_range(r["inicio"], r["fin"])
+        df = df or di
+
+        for tipo, clave, nombre in self.claves(r):
+            sh = self._shard(tipo, clave, nombre)
+            sh["csv"].escribir(r)
+            sh["geojson"].escribir(r)
+
+            if di and (sh["desde"] is None or di < sh["desde"]):
+                sh["desde"] = di
+            if df and (sh["hasta"] is None or df > sh["hasta"]):
+                sh["hasta"] = df
+
+            feat = _SalidaGeoJSON.feature(r)
+            if feat:
+                lon, lat = feat["geometry"]["coordinates"]
+                b = sh["bbox"] or [lon, lat, lon, lat]
+                sh["bbox"] = [min(b[0], lon), min(b[1], lat), max(b[2], lon), max(b[3], lat)]
+
+    def _indice_previo(self) -> dict:
+        try:
+            with open(self.indice_path, encoding="utf-8") as f:
+                return {s["id"]: s for s in json.load(f).get("shards", [])}
+        except Exception:
+            return {}
+
+    def cerrar(self, ok: bool = True):
+        for sh in self.shards.values():
+            sh["csv"].cerrar(ok)
+            sh["geojson"].cerrar(ok)
+
+        if not ok:
+            return
+
+        previo = self._indice_previo()
+        entradas = []
+        cambiados = 0
+
+        for sid in sorted(self.shards):
+            sh = self.shards[sid]
+            cambiados += sh["csv"].cambiado or sh["geojson"].cambiado
+            entradas.append(
+                {
+                    "id": sid,
+                    "tipo": sh["tipo"],
+                    "clave": sh["clave"],
+                    "nombre": sh["nombre"],
+                    "eventos": sh["csv"].n,
+                    "features": sh["geojson"].n,
+                    "desde": sh["desde"].isoformat() if sh["desde"] else None,
+                    "hasta": sh["hasta"].isoformat() if sh["hasta"] else None,
+                    "bbox": [round(x, 6) for x in sh["bbox"]] if sh["bbox"] else None,
+                    "csv": os.path.relpath(sh["csv"].ruta, self.dir).replace(os.sep, "/"),
+                    "geojson": os.path.relpath(sh["geojson"].ruta, self.dir).replace(os.sep, "/"),
+                    "sha256": {"csv": sh["csv"].sha256, "geojson": sh["geojson"].sha256},
+                }
+            )
+
+        # Shards que existían y ya no tienen eventos.
+        for sid in set(previo) - set(self.shards):
+            for clave in ("csv", "geojson"):
+                try:
+                    os.remove(os.path.join(self.dir, previo[sid][clave]))
+                except (OSError, KeyError):
+                    pass
+
+        indice = _SalidaArchivo(self.indice_path, silencioso=True)
+        indice.f.write(json.dumps({"shards": entradas}, ensure_ascii=False, indent=2) + "\n")
+        indice.cerrar(True)
+
+        print(
+            f"🧩 Shards en: {self.dir} ({len(entradas)} shards, {cambiados} cambiados, "
+            f"{len(set(previo) - set(self.shards))} eliminados)"
+        )
+
+
+def _ics_texto(valor: str) -> str:
+    """
+    Escapa un valor TEXT de iCalendar (RFC 5545 §3.3.11).
+    """
+    return (
+        (valor or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_plegar(linea: str) -> str:
+    """
+    Pliega una línea a 75 octetos sin partir caracteres UTF-8.
+    """
+    partes = []
+    actual = ""
+
+    for ch in linea:
+        limite = 75 if not partes else 74
+        if len((actual + ch).encode("utf-8")) > limite:
+            partes.append(actual)
+            actual = ch
+        else:
+            actual += ch
+
+    partes.append(actual)
+    return "\r\n ".join(partes) + "\r\n"
+
+
+class _ArchivoICS(_SalidaArchivo):
+    """
+    Un feed .ics escrito en streaming (VEVENT a VEVENT).
+    """
+
+    def __init__(self, ruta: str, nombre: str, **kw):
+        super().__init__(ruta, newline="", **kw)
+        for linea in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Scrap-Calendar-Agility//RSCE Agility//ES",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{_ics_texto(nombre)}",
+            "X-WR-TIMEZONE:Europe/Madrid",
+            "REFRESH-INTERVAL;VALUE=DURATION:PT12H",
+            "X-PUBLISHED-TTL:PT12H",
+        ):
+            self.f.write(_ics_plegar(linea))
+
+    def escribir_vevent(self, lineas: List[str]):
+        for linea in lineas:
+            self.f.write(_ics_plegar(linea))
+        self.n += 1
+
+    def _pie(self):
+        self.f.write(_ics_plegar("END:VCALENDAR"))
+
+
+class _SalidaICS:
+    """
+    Feeds iCalendar para suscribirse desde Google Calendar, Outlook, etc.:
+        <dir>/agility_rsce.ics            (todos los eventos)
+        <dir>/provincia/zaragoza.ics      (uno por provincia)
+        <dir>/indice.json                 (sha256 de cada feed, útil como ETag)
+
+    - UID estable por evento, derivado de su URL canónica.
+    - DTSTAMP y SEQUENCE solo cambian cuando cambia el evento (estado persistido),
+      así que un feed sin cambios es idéntico byte a byte y no se reescribe.
+    """
+
+    NOMBRE = "Agility RSCE"
+
+    def __init__(self, directorio: str, ruta_estado: pathlib.Path, limite: Optional[_LimiteFicheros] = None):
+        self.dir = directorio
+        self.limite = limite
+        self.ruta_estado = ruta_estado
+        self.indice_path = os.path.join(directorio, "indice.json")
+        self.feeds = {}
+
+        try:
+            self.estado_previo = json.loads(ruta_estado.read_text(encoding="utf-8"))
+        except Exception:
+            self.estado_previo = {}
+        self.estado = {}
+
+        self.global_ = _ArchivoICS(
+            os.path.join(directorio, "agility_rsce.ics"), self.NOMBRE, silencioso=True, limite=limite
+        )
+
+    @staticmethod
+    def uid(r: dict) -> str:
+        # URL canónica: una barra final o un utm_* no crean un evento nuevo en el calendario.
+        base = clave_evento(r["nombre"], r["inicio"], r["url"], r["ciudad"])
+        return hashlib.sha1(base.encode("utf-8")).hexdigest()[:24] + "@agility-rsce"
+
+    def _vevent(self, r: dict) -> Optional[List[str]]:
+        di, df = parse_date_range(r["inicio"], r["fin"])
+        if di is None:
+            return None
+
+        # DTEND de eventos de día completo es exclusivo.
+        fin = max(df or di, di) + datetime.timedelta(days=1)
+        lugar = ", ".join(
+            x for x in (r.get("direccion"), r.get("municipio") or r["ciudad"], r.get("provincia")) if x
+        )
+        detalle = [
+            f"{etiqueta}: {r[campo]}"
+            for campo, etiqueta in (("organizador", "Organiza"), ("jueces", "Jueces"), ("grados", "Grados"))
+            if r.get(campo)
+        ]
+
+        cuerpo = [
+            f"DTSTART;VALUE=DATE:{di.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{fin.strftime('%Y%m%d')}",
+            f"SUMMARY:{_ics_texto(r['nombre'])}",
+        ]
+        if lugar:
+            cuerpo.append(f"LOCATION:{_ics_texto(lugar)}")
+        if r.get("lat") is not None and r.get("lon") is not None:
+            cuerpo.append(f"GEO:{float(r['lat']):.6f};{float(r['lon']):.6f}")
+        if r["url"]:
+            cuerpo.append(f"URL:{r['url']}")
+        descripcion = "\n".join(detalle + ([r["url"]] if r["url"] else []))
+        if descripcion:
+            cuerpo.append(f"DESCRIPTION:{_ics_texto(descripcion)}")
+        cuerpo.append("STATUS:CONFIRMED")
+
+        uid = self.uid(r)
+        h = hashlib.sha1("\n".join(cuerpo).encode("utf-8")).hexdigest()
+        previo = self.estado_previo.get(uid, {})
+
+        if previo.get("hash") == h:
+            est = previo
+        else:
+            est = {
+                "hash": h,
+                "dtstamp": datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+                "sequence": previo.get("sequence", -1) + 1,
+            }
+        self.estado[uid] = est
+
+        return (
+            ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{est['dtstamp']}", f"SEQUENCE:{est['sequence']}"]
+            + cuerpo
+            + ["END:VEVENT"]
+        )
+
+    def escribir(self, r: dict):
+        lineas = self._vevent(r)
+        if lineas is None:
+            return
+
+        self.global_.escribir_vevent(lineas)
+
+        provincia = r.get("provincia", "")
+        if provincia:
+            clave = slug_texto(provincia).replace(" ", "-")
+            feed = self.feeds.get(clave)
+            if feed is None:
+                feed = self.feeds[clave] = _ArchivoICS(
+                    os.path.join(self.dir, "provincia", clave + ".ics"),
+                    f"{self.NOMBRE} – {provincia}",
+                    silencioso=True,
+                    limite=self.limite,
+                )
+            feed.escribir_vevent(lineas)
+
+    def _indice_previo(self) -> dict:
+        try:
+            with open(self.indice_path, encoding="utf-8") as f:
+                return {e["archivo"]: e for e in json.load(f).get("feeds", [])}
+        except Exception:
+            return {}
+
+    def cerrar(self, ok: bool = True):
+        feeds = [self.global_] + [self.feeds[k] for k in sorted(self.feeds)]
+
+        for feed in feeds:
+            feed.cerrar(ok)
+
+        if not ok:
+            return
+
+        previo = self._indice_previo()
+        entradas = [
+            {
+                "archivo": os.path.relpath(feed.ruta, self.dir).replace(os.sep, "/"),
+                "eventos": feed.n,
+                "sha256": feed.sha256,
+            }
+            for feed in feeds
+        ]
+        actuales = {e["archivo"] for e in entradas}
+
+        for archivo in set(previo) - actuales:
+            try:
+                os.remove(os.path.join(self.dir, archivo))
+            except OSError:
+                pass
+
+        indice = _SalidaArchivo(self.indice_path, silencioso=True)
+        indice.f.write(json.dumps({"feeds": entradas}, ensure_ascii=False, indent=2) + "\n")
+        indice.cerrar(True)
+
+        try:
+            self.ruta_estado.parent.mkdir(parents=True, exist_ok=True)
+            self.ruta_estado.write_text(json.dumps(self.estado, indent=1, sort_keys=True), encoding="utf-8")
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el estado de los calendarios: {e}")
+
+        cambiados = sum(feed.cambiado for feed in feeds)
+        print(f"📅 Calendarios en: {self.dir} ({len(feeds)} feeds, {cambiados} cambiados)")
+
+
+# =========================
+# Enriquecimiento (páginas de detalle)
+# =========================
+class _LimitadorHost:
+    """
+    Limita las peticiones por host a 'por_segundo' (compartido entre hilos).
+    """
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self.lock = threading.Lock()
+        self.siguiente = {}
+
+    def esperar(self, url: str):
+        if not self.intervalo:
+            return
+
+        host = urllib.parse.urlsplit(url).netloc
+
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self.siguiente.get(host, 0.0))
+            self.siguiente[host] = turno + self.intervalo
+
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+class _ProveedorGeocodificacion:
+    """
+    Un geocodificador remoto de la cadena (Nominatim, Photon...) con su propio
+    ritmo (min_delay entre peticiones) y su número de hilos (concurrencia).
+    Los errores transitorios se reintentan con backoff; si persisten se lanzan
+    (nunca se confunden con "sin resultado").
+    """
+
+    def __init__(self, nombre: str, url: str, geocode, min_delay: float, concurrencia: int, reintentos: int, **kwargs):
+        self.nombre = nombre
+        self.url = url
+        self.geocode = geocode
+        self.kwargs = kwargs
+        self.concurrencia = max(1, concurrencia)
+        self.reintentos = reintentos
+        self.limitador = _LimitadorHost(1.0 / min_delay if min_delay > 0 else 0)
+        self.stats = {"consultas": 0, "aciertos": 0, "sin_resultado": 0, "errores": 0}
+
+    def consultar(self, q: str):
+        geopy_exc = _importar("geopy.exc")
+        transitorios = (geopy_exc.GeocoderTimedOut, geopy_exc.GeocoderUnavailable, geopy_exc.GeocoderRateLimited)
+
+        for intento in range(self.reintentos + 1):
+            self.limitador.esperar(self.url)
+            try:
+                return self.geocode(q, **self.kwargs)
+            except transitorios as e:
+                if intento == self.reintentos:
+                    raise
+                time.sleep(getattr(e, "retry_after", None) or 2 ** intento)
+
+    def anotar(self, loc, error: Optional[Exception]):
+        self.stats["consultas"] += 1
+
+        if error is not None:
+            if not self.stats["errores"]:
+                print(f"    ⚠️ Geocodificador {self.nombre}: {error}")
+            self.stats["errores"] += 1
+        elif loc is None:
+            self.stats["sin_resultado"] += 1
+        else:
+            self.stats["aciertos"] += 1
+
+    def resumen(self, duraciones: dict) -> dict:
+        ds = sorted(duraciones.get(f"geocode_{self.nombre}", []))
+        n = self.stats["consultas"]
+
+        return {
+            **self.stats,
+            "tasa_acierto": round(self.stats["aciertos"] / n, 3) if n else None,
+            "media_ms": round(1000 * sum(ds) / len(ds), 2) if ds else None,
+            "p95_ms": round(1000 * ds[min(len(ds) - 1, int(len(ds) * 0.95))], 2) if ds else None,
+        }
+
+
+# =========================
+# Capturas de depuración
+# =========================
+class _CapturasDebug:
+    """
+    Almacén acotado de capturas de depuración:
+    - HTML comprimido con gzip (y screenshot PNG si lo hay)
+    - deduplicado por hash de contenido: una página idéntica solo actualiza el índice
+    - anillo con las últimas N capturas distintas; las más antiguas se borran
+    - índice 'capturas.json' con fechas y metadatos del run, que sirve de
+      historial de cómo ha ido cambiando la web de RSCE
+    """
+
+    def __init__(self, directorio: pathlib.Path, max_capturas: int = 20, run: Optional[dict] = None):
+        self.dir = directorio
+        self.max_capturas = max(1, max_capturas)
+        self.run = run or {}
+        self.indice_path = self.dir / "capturas.json"
+
+    def _leer_indice(self) -> list:
+        try:
+            return json.loads(self.indice_path.read_text(encoding="utf-8"))
+        except Exception:
+            return []
+
+    def _borrar(self, entrada: dict):
+        for clave in ("archivo", "png"):
+            if entrada.get(clave):
+                try:
+                    (self.dir / entrada[clave]).unlink()
+                except OSError:
+                    pass
+
+    def capturar(self, motivo: str, html: str, png: Optional[bytes] = None, **meta) -> Optional[pathlib.Path]:
+        """
+        Guarda una captura y devuelve su ruta. No rompe nunca el run.
+        """
+        try:
+            datos = html.encode("utf-8")
+            sha = hashlib.sha256(datos).hexdigest()
+            ahora = datetime.datetime.now().isoformat(timespec="seconds")
+
+            self.dir.mkdir(parents=True, exist_ok=True)
+            indice = self._leer_indice()
+            previa = next((e for e in indice if e.get("sha256") == sha), None)
+
+            if previa is not None:
+                indice.remove(previa)
+                previa["ultima"] = ahora
+                previa["veces"] = previa.get("veces", 1) + 1
+                previa["motivo"] = motivo
+                indice.append(previa)
+                entrada = previa
+                print(f"📄 Debug HTML sin cambios ({sha[:12]}), ya capturado en: {self.dir / previa['archivo']}")
+
+            else:
+                stem = f"{ahora.replace(':', '').replace('-', '')}_{motivo}_{sha[:12]}"
+                archivo = f"{stem}.html.gz"
+                (self.dir / archivo).write_bytes(gzip.compress(datos, mtime=0))
+
+                entrada = {
+                    "sha256": sha,
+                    "motivo": motivo,
+                    "archivo": archivo,
+                    "png": None,
+                    "primera": ahora,
+                    "ultima": ahora,
+                    "veces": 1,
+                    "bytes_html": len(datos),
+                    "bytes_gz": (self.dir / archivo).stat().st_size,
+                    "run": {**self.run, **meta},
+                }
+
+                if png:
+                    entrada["png"] = f"{stem}.png"
+                    (self.dir / entrada["png"]).write_bytes(png)
+                    print(f"📸 Debug screenshot guardado en: {self.dir / entrada['png']}")
+
+                indice.append(entrada)
+                print(f"📄 Debug HTML guardado en: {self.dir / archivo}")
+
+            while len(indice) > self.max_capturas:
+                self._borrar(indice.pop(0))
+
+            self.indice_path.write_text(json.dumps(indice, ensure_ascii=False, indent=2), encoding="utf-8")
+            return self.dir / entrada["archivo"]
+
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar captura debug: {e}")
+            return None
+
+
 # =========================
 # Scraper
 # =========================
@@ -115,6 +1582,11 @@ class RSCEAgilityExporter:
         self.SOLO_PRIMERA = self._to_bool(os.getenv("SOLO_PRIMERA_PAGINA"), False)
         self.MAX_PAGINAS = int(os.getenv("MAX_PAGINAS", "50"))
 
+        # Paginación en la descarga directa (JetSmartFilters).
+        self.URL_PAGINA = os.getenv("URL_PAGINA", "{base}/pagenum/{n}/")
+        self._sesion = None
+        self._detalles = None
+
         # Importante:
         # Si la web RSCE cambia y el filtro UI falla, no rompemos el script.
         # Luego se aplica el filtrado en postproceso.
@@ -123,9 +1595,97 @@ class RSCEAgilityExporter:
 
         self.GEOCODIFICAR = self._to_bool(os.getenv("GEOCODIFICAR"), True)
 
+        # Servidor Nominatim (por defecto el público, 1 req/s como pide su política).
+        self.NOMINATIM_DOMAIN = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+        self.NOMINATIM_SCHEME = os.getenv("NOMINATIM_SCHEME", "https")
+        self.GEOCODE_MIN_DELAY = float(os.getenv("GEOCODE_MIN_DELAY", "1"))
+        self.NOMINATIM_CONCURRENCIA = int(os.getenv("NOMINATIM_CONCURRENCIA", "1"))
+
+        # Cadena de geocodificadores remotos, en orden de preferencia (nominatim, photon).
+        self.GEOCODERS = [x.strip().lower() for x in os.getenv("GEOCODERS", "nominatim").split(",") if x.strip()]
+        self.PHOTON_DOMAIN = os.getenv("PHOTON_DOMAIN", "photon.komoot.io")
+        self.PHOTON_SCHEME = os.getenv("PHOTON_SCHEME", "https")
+        self.PHOTON_MIN_DELAY = float(os.getenv("PHOTON_MIN_DELAY", "1"))
+        self.PHOTON_CONCURRENCIA = int(os.getenv("PHOTON_CONCURRENCIA", "1"))
+        self.REINTENTOS_GEOCODE = int(os.getenv("REINTENTOS_GEOCODE", "2"))
+        # Consultas pendientes que se juntan antes de lanzar un lote.
+        self.GEOCODE_LOTE = max(1, int(os.getenv("GEOCODE_LOTE", "50")))
+        # Registros retenidos como mucho a la espera de un lote.
+        self.GEOCODE_VENTANA = max(1, int(os.getenv("GEOCODE_VENTANA", "200")))
+        self._proveedores = None
+
+        # Reintentos de la descarga directa ante 429/5xx (con backoff).
+        self.REINTENTOS_HTTP = int(os.getenv("REINTENTOS_HTTP", "3"))
+
+        # Fallback con navegador si falla la descarga directa.
+        # Con false no hace falta tener instalados selenium ni webdriver-manager.
+        self.USAR_SELENIUM = self._to_bool(os.getenv("USAR_SELENIUM"), True)
+
+        # Enriquecimiento opcional con las páginas de detalle de cada evento
+        # (organizador, dirección del recinto, jueces, grados).
+        self.ENRIQUECER_DETALLE = self._to_bool(os.getenv("ENRIQUECER_DETALLE"), False)
+        self.DETALLE_CONCURRENCIA = max(1, int(os.getenv("DETALLE_CONCURRENCIA", "4")))
+        self.DETALLE_POR_SEGUNDO = float(os.getenv("DETALLE_POR_SEGUNDO", "2"))
+        self.DETALLE_TTL_DIAS = int(os.getenv("DETALLE_TTL_DIAS", "7"))
+        self._limitador = _LimitadorHost(self.DETALLE_POR_SEGUNDO)
+
+        # Salidas particionadas por mes y provincia + índice
+        self.GENERAR_SHARDS = self._to_bool(os.getenv("GENERAR_SHARDS"), True)
+        self.DIR_SHARDS = os.getenv("CARPETA_SHARDS", os.path.join(self.OUTDIR, "shards"))
+
+        # Máximo de shards/feeds abiertos a la vez (el resto se reabre al escribir)
+        self.MAX_FICHEROS_ABIERTOS = int(os.getenv("MAX_FICHEROS_ABIERTOS", "64"))
+
+        # Feeds iCalendar (global + por provincia)
+        self.GENERAR_ICS = self._to_bool(os.getenv("GENERAR_ICS"), True)
+        self.DIR_ICS = os.getenv("CARPETA_ICS", os.path.join(self.OUTDIR, "calendarios"))
+
+        self.OUTMETRICAS = os.path.join(
+            self.OUTDIR,
+            os.getenv("NOMBRE_METRICAS", "metricas_run.json"),
+        )
+        self.metricas = {}
+        self._duraciones = {}
+
+        # Informe de duplicados fusionados (URL canónica o título casi igual)
+        self.OUTDUPLICADOS = os.path.join(
+            self.OUTDIR,
+            os.getenv("NOMBRE_DUPLICADOS", "duplicados_run.json"),
+        )
+        self.duplicados = _IndiceDuplicados()
+        self._t0_run = time.perf_counter()
+
         self.DEBUG_DIR = pathlib.Path("debug_rsce")
         self.DEBUG_DIR.mkdir(exist_ok=True)
 
+        # Capturas de cada página descargada (desactivado por defecto).
+        # Los fallos (timeouts, estructuras desconocidas) se capturan siempre.
+        self.DEBUG_CAPTURAS = self._to_bool(os.getenv("DEBUG_CAPTURAS"), False)
+        self.capturas = _CapturasDebug(
+            self.DEBUG_DIR,
+            max_capturas=int(os.getenv("DEBUG_MAX_CAPTURAS", "20")),
+            run={
+                "url_base": self.URL_BASE,
+                "run_id": os.getenv("GITHUB_RUN_ID"),
+                "run_number": os.getenv("GITHUB_RUN_NUMBER"),
+                "sha": os.getenv("GITHUB_SHA"),
+            },
+        )
+
+        # Cachés persistentes entre runs (estrategia de extracción, etc.)
+        self.CACHE_DIR = pathlib.Path(os.getenv("CARPETA_CACHE", ".cache_rsce"))
+        self.CACHE_ESTRATEGIAS = self.CACHE_DIR / "estrategias_extraccion.json"
+        self._estrategias = None
+
+        # Índice canónico de ubicaciones (alias + coordenadas geocodificadas)
+        self.ubicaciones = _IndiceUbicaciones(self.CACHE_DIR / "ubicaciones.json")
+
+        # Histórico de todos los eventos vistos (también pasados y anulados)
+        self.GUARDAR_HISTORICO = self._to_bool(os.getenv("GUARDAR_HISTORICO"), True)
+        self.historico = _HistoricoEventos(
+            pathlib.Path(os.getenv("ARCHIVO_HISTORICO", str(self.CACHE_DIR / "historico.sqlite")))
+        )
+
     @staticmethod
     def _to_bool(v, default=False):
         if v is None:
@@ -134,7 +1694,8 @@ class RSCEAgilityExporter:
 
     # ---------- Selenium ----------
     def _init_driver(self):
-        opts = Options()
+        sel = _selenium()
+        opts = sel.Options()
 
         opts.add_argument("--headless=new")
         opts.add_argument("--disable-gpu")
@@ -153,8 +1714,8 @@ class RSCEAgilityExporter:
         opts.add_experimental_option("excludeSwitches", ["enable-automation"])
         opts.add_experimental_option("useAutomationExtension", False)
 
-        d = webdriver.Chrome(
-            service=ChromeService(ChromeDriverManager().install()),
+        d = sel.webdriver.Chrome(
+            service=sel.ChromeService(sel.ChromeDriverManager().install()),
             options=opts,
         )
 
@@ -165,21 +1726,22 @@ class RSCEAgilityExporter:
         """
         Guarda HTML y screenshot para poder ver qué ha visto Selenium en GitHub Actions.
         """
-        self.DEBUG_DIR.mkdir(exist_ok=True)
-
         try:
-            html_path = self.DEBUG_DIR / f"{nombre_base}.html"
-            html_path.write_text(d.page_source, encoding="utf-8")
-            print(f"📄 Debug HTML guardado en: {html_path}")
+            html = d.page_source
         except Exception as e:
-            print(f"⚠️ No se pudo guardar HTML debug: {e}")
+            print(f"⚠️ No se pudo leer HTML debug: {e}")
+            return
 
         try:
-            png_path = self.DEBUG_DIR / f"{nombre_base}.png"
-            d.save_screenshot(str(png_path))
-            print(f"📸 Debug screenshot guardado en: {png_path}")
+            png = d.get_screenshot_as_png()
         except Exception as e:
             print(f"⚠️ No se pudo guardar screenshot debug: {e}")
+            png = None
+
+        self.capturas.capturar(nombre_base, html, png=png)
+
+    def _guardar_debug_html(self, html: str, nombre_base: str, **meta):
+        self.capturas.capturar(nombre_base, html, **meta)
 
     def _aceptar_cookies_si_aparece(self, d):
         """
@@ -192,11 +1754,12 @@ class RSCEAgilityExporter:
             "//button[contains(translate(., 'ALLOW', 'allow'), 'allow')]",
             "//button[contains(translate(., 'OK', 'ok'), 'ok')]",
         ]
+        sel = _selenium()
 
         for xp in posibles_xpath:
             try:
-                btn = WebDriverWait(d, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, xp))
+                btn = sel.WebDriverWait(d, 3).until(
+                    sel.EC.element_to_be_clickable((sel.By.XPATH, xp))
                 )
                 d.execute_script("arguments[0].click();", btn)
                 print("[DEBUG] Banner/cookies cerrado")
@@ -216,8 +1779,11 @@ class RSCEAgilityExporter:
         - enlaces a eventos
         - textos reales como Agility / Prueba de Agility / Leer más
         """
+        sel = _selenium()
+        By = sel.By
+
         try:
-            WebDriverWait(d, 90).until(
+            sel.WebDriverWait(d, 90).until(
                 lambda driver: (
                     len(driver.find_elements(By.CSS_SELECTOR, "div.jet-listing-grid__item")) > 0
                     or len(driver.find_elements(By.CSS_SELECTOR, "article")) > 0
@@ -233,7 +1799,7 @@ class RSCEAgilityExporter:
             print("✅ Listado de eventos detectado")
             return True
 
-        except TimeoutException:
+        except sel.TimeoutException:
             print("❌ Timeout esperando listado de eventos RSCE")
             self._guardar_debug(d, "rsce_timeout_listado")
             raise
@@ -248,6 +1814,8 @@ class RSCEAgilityExporter:
         Rellena 'Desde' con hoy y 'Hasta' vacío. Pulsa 'Ordenar' si existe.
         Si falla, no rompe: el filtrado desde hoy se hace también en postproceso.
         """
+        By = _selenium().By
+
         try:
             hoy = datetime.date.today().strftime("%d/%m/%Y")
 
@@ -287,7 +1855,7 @@ class RSCEAgilityExporter:
 
     def _detectar_total_paginas(self, d) -> int:
         try:
-            elems = d.find_elements(By.CSS_SELECTOR, ".jet-filters-pagination__link")
+            elems = d.find_elements(_selenium().By.CSS_SELECTOR, ".jet-filters-pagination__link")
             nums = []
 
             for el in elems:
@@ -305,12 +1873,15 @@ class RSCEAgilityExporter:
             return 1
 
     def _ir_a_pagina(self, d, page_num: int) -> bool:
+        sel = _selenium()
+        By = sel.By
+
         try:
             if page_num == 1:
                 return True
 
-            btn = WebDriverWait(d, 8).until(
-                EC.element_to_be_clickable(
+            btn = sel.WebDriverWait(d, 8).until(
+                sel.EC.element_to_be_clickable(
                     (
                         By.XPATH,
                         f"//div[contains(@class,'jet-filters-pagination__link') and normalize-space(text())='{page_num}']",
@@ -390,267 +1961,901 @@ class RSCEAgilityExporter:
 
         return "", ""
 
-    def _extraer_eventos(self, html: str) -> List[Tuple[str, str, str, str, str, str]]:
+    def _evento_desde_bloque(self, b) -> Optional[Tuple[str, str, str, str, str, str]]:
         """
-        Devuelve lista:
-        (nombre, inicio, fin, url, ciudad, estado) con estado='Anulado' o 'Activo'
-
-        Mantiene el extractor original y añade fallback si RSCE cambia estructura.
+        Convierte un bloque HTML de evento en
+        (nombre, inicio, fin, url, ciudad, estado) o None si no parece un evento.
         """
-        soup = BeautifulSoup(html, "html.parser")
-        eventos = []
+        h2 = b.find("h2")
+        a = h2.find("a") if h2 else None
+
+        # Fallback si el título no está en h2
+        if not a:
+            a = b.select_one("a[href*='/eventos-rsce/']") or b.select_one("a[href*='rsce.es']")
+
+        if h2:
+            nombre = self._texto_limpio(h2.get_text(" ", strip=True))
+        elif a:
+            nombre = self._texto_limpio(a.get_text(" ", strip=True))
+        else:
+            nombre = ""
+
+        url = a.get("href", "").strip() if a else ""
+
+        texto_bloque = self._texto_limpio(b.get_text(" ", strip=True))
+
+        # Evita bloques genéricos enormes que no sean un evento.
+        if not nombre and "Agility" not in texto_bloque:
+            return None
+
+        # Si el nombre está vacío pero el bloque menciona agility, intentamos construir algo mínimo.
+        if not nombre and "Agility" in texto_bloque:
+            nombre = texto_bloque[:120]
+
+        # Fechas: selector original
+        fechas = b.select(".jet-listing-dynamic-field__content")
+        inicio = fechas[0].get_text(strip=True) if len(fechas) > 0 else ""
+        fin = fechas[1].get_text(strip=True) if len(fechas) > 1 else ""
+
+        # Fechas: fallback por texto
+        if not inicio and not fin:
+            inicio, fin = self._extraer_fechas_desde_texto(texto_bloque)
+
+        # Ciudad: selector original
+        lugar = b.select_one(".elementor-icon-box-title span")
+        ciudad = lugar.get_text(strip=True) if lugar else ""
+
+        # Ciudad: fallback
+        if not ciudad:
+            ciudad = self._extraer_ciudad_desde_texto(texto_bloque)
+
+        # Estado
+        badge = b.select_one("span.jet-listing-dynamic-terms__link")
+        estado_txt = badge.get_text(" ", strip=True).lower() if badge else texto_bloque.lower()
+        estado = "Anulado" if "anulado" in estado_txt else "Activo"
+
+        # Filtro mínimo para no meter enlaces vacíos o navegación
+        nombre_lower = nombre.lower()
+        if (
+            nombre
+            and (
+                "agility" in nombre_lower
+                or "agility" in texto_bloque.lower()
+                or "prueba" in nombre_lower
+            )
+        ):
+            return (nombre, inicio, fin, url, ciudad, estado)
+
+        return None
+
+    def _mostrar_ejemplos(self, eventos, etiqueta: str):
+        # Los duplicados se resuelven después, en un único índice (_deduplicar).
+        print(f"      Ejemplos{etiqueta}:", [f"{e[5]} · {e[0][:48]}" for e in eventos[:3]])
+        return eventos
 
-        # Extractor principal: estructura original JetEngine
+    def _extraer_eventos_jet(self, soup):
+        """
+        Extractor principal de la estructura original JetEngine.
+        """
         bloques = soup.select("div.jet-listing-grid__item")
+        print(f"[DEBUG] Bloques JetEngine encontrados: {len(bloques)}")
+
+        eventos = [ev for ev in map(self._evento_desde_bloque, bloques) if ev]
+        return self._mostrar_ejemplos(eventos, "")
+
+    def _extraer_eventos_contenedores(self, soup):
+        """
+        Fallback si RSCE cambia estructura: contenedores comunes de WordPress/Elementor.
+
+        Esos contenedores se solapan y se anidan, así que no se recorren todos:
+        se parte de cada enlace a evento y se sube de contenedor en contenedor
+        hasta el primero que tenga fecha o lugar. En Elementor cada widget tiene
+        su propio contenedor, y el del título solo tiene el título. Si se llega a
+        un bloque con varios títulos sin encontrar datos, el enlace se descarta.
+        Cada evento se analiza una única vez.
+        """
+        clases = {"elementor-widget-container", "jet-listing-grid", "jet-listing"}
 
-        # Fallback: si no hay bloques JetEngine, probamos otros contenedores comunes.
-        if not bloques:
-            bloques = soup.select("article, .elementor-widget-container, .jet-listing-grid, .jet-listing")
+        def es_contenedor(tag):
+            return tag.name == "article" or bool(clases.intersection(tag.get("class") or []))
+
+        def tiene_datos(b):
+            if b.select_one(".jet-listing-dynamic-field__content, .elementor-icon-box-title span"):
+                return True
+            return any(self._extraer_fechas_desde_texto(self._texto_limpio(b.get_text(" ", strip=True))))
+
+        bloques = []
+        vistos = set()
+
+        for a in soup.select("a[href*='/eventos-rsce/'], h2 a"):
+            b = a.find_parent(es_contenedor)
+
+            while b is not None and id(b) not in vistos and len(b.find_all("h2", limit=2)) < 2:
+                if tiene_datos(b):
+                    vistos.add(id(b))
+                    bloques.append(b)
+                    break
+                b = b.find_parent(es_contenedor)
 
         print(f"[DEBUG] Bloques candidatos encontrados: {len(bloques)}")
 
-        for b in bloques:
-            h2 = b.find("h2")
-            a = h2.find("a") if h2 else None
+        eventos = [ev for ev in map(self._evento_desde_bloque, bloques) if ev]
+        return self._mostrar_ejemplos(eventos, "")
+
+    # ---------- Selección de extractor ----------
+    # Cada estrategia declara una huella: selectores baratos de contar que deben
+    # aparecer para que el extractor sea candidato.
+    ESTRATEGIAS_EXTRACCION = (
+        ("h2_enlaces", ("h2 a",), "_extraer_eventos_html_directo"),
+        ("jet_grid", ("div.jet-listing-grid__item",), "_extraer_eventos_jet"),
+        ("contenedores", ("article, .elementor-widget-container, .jet-listing-grid, .jet-listing",), "_extraer_eventos_contenedores"),
+    )
+
+    # Prioridad por origen del HTML: la descarga directa usa su extractor h2 y
+    # Selenium (DOM ya renderizado) el de JetEngine, como antes del registro.
+    PRIORIDAD_EXTRACCION = {
+        "directo": ("h2_enlaces", "jet_grid", "contenedores"),
+        "selenium": ("jet_grid", "contenedores", "h2_enlaces"),
+    }
+
+    # Selectores que definen la "estructura" de una página (además de los de las huellas).
+    SELECTORES_ESTRUCTURA = (
+        "h3",
+        ".jet-listing-dynamic-field__content",
+        "span.jet-listing-dynamic-terms__link",
+        ".elementor-icon-box-title span",
+    )
+
+    def _selectores_huella(self) -> List[str]:
+        selectores = [sel for _, huella, _ in self.ESTRATEGIAS_EXTRACCION for sel in huella]
+        return selectores + list(self.SELECTORES_ESTRUCTURA)
+
+    def _huella_pagina(self, soup) -> Tuple[str, dict]:
+        """
+        Mira qué selectores clave aparecen y devuelve (hash_estructura, presentes).
+        El hash solo depende de qué selectores aparecen, no de cuántas veces,
+        así que todas las páginas del mismo listado comparten estructura. Basta
+        con select_one: no se recorre el documento entero por cada selector.
+        """
+        presentes = {sel: soup.select_one(sel) is not None for sel in self._selectores_huella()}
+        firma = "|".join(f"{sel}={int(p)}" for sel, p in presentes.items())
 
-            # Fallback si el título no está en h2
-            if not a:
-                a = b.select_one("a[href*='/eventos-rsce/']") or b.select_one("a[href*='rsce.es']")
+        return hashlib.sha1(firma.encode("utf-8")).hexdigest()[:16], presentes
 
-            if h2:
-                nombre = self._texto_limpio(h2.get_text(" ", strip=True))
-            elif a:
-                nombre = self._texto_limpio(a.get_text(" ", strip=True))
-            else:
-                nombre = ""
+    def _conteos_pagina(self, soup) -> dict:
+        """
+        Conteos completos de los selectores clave. Solo para guardar o volcar una
+        estructura nueva, no en cada página.
+        """
+        return {sel: len(soup.select(sel)) for sel in self._selectores_huella()}
 
-            url = a.get("href", "").strip() if a else ""
+    def _cache_estrategias(self) -> dict:
+        if self._estrategias is None:
+            try:
+                self._estrategias = json.loads(self.CACHE_ESTRATEGIAS.read_text(encoding="utf-8"))
+            except Exception:
+                self._estrategias = {}
+        return self._estrategias
+
+    def _recordar_estrategia(self, estructura: str, nombre: Optional[str], conteos: dict):
+        cache = self._cache_estrategias()
+        cache[estructura] = {
+            "estrategia": nombre,
+            "huella": conteos,
+            "actualizado": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
 
-            texto_bloque = self._texto_limpio(b.get_text(" ", strip=True))
+        try:
+            self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            self.CACHE_ESTRATEGIAS.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la caché de estrategias: {e}")
 
-            # Evita bloques genéricos enormes que no sean un evento.
-            if not nombre and "Agility" not in texto_bloque:
-                continue
+    def _extraer_eventos(self, html: str, origen: str = "directo") -> List[Tuple[str, str, str, str, str, str]]:
+        """
+        Devuelve lista:
+        (nombre, inicio, fin, url, ciudad, estado) con estado='Anulado' o 'Activo'
 
-            # Si el nombre está vacío pero el bloque menciona agility, intentamos construir algo mínimo.
-            if not nombre and "Agility" in texto_bloque:
-                nombre = texto_bloque[:120]
-
-            # Fechas: selector original
-            fechas = b.select(".jet-listing-dynamic-field__content")
-            inicio = fechas[0].get_text(strip=True) if len(fechas) > 0 else ""
-            fin = fechas[1].get_text(strip=True) if len(fechas) > 1 else ""
-
-            # Fechas: fallback por texto
-            if not inicio and not fin:
-                inicio, fin = self._extraer_fechas_desde_texto(texto_bloque)
-
-            # Ciudad: selector original
-            lugar = b.select_one(".elementor-icon-box-title span")
-            ciudad = lugar.get_text(strip=True) if lugar else ""
-
-            # Ciudad: fallback
-            if not ciudad:
-                ciudad = self._extraer_ciudad_desde_texto(texto_bloque)
-
-            # Estado
-            badge = b.select_one("span.jet-listing-dynamic-terms__link")
-            estado_txt = badge.get_text(" ", strip=True).lower() if badge else texto_bloque.lower()
-            estado = "Anulado" if "anulado" in estado_txt else "Activo"
-
-            # Filtro mínimo para no meter enlaces vacíos o navegación
-            nombre_lower = nombre.lower()
-            if (
-                nombre
-                and (
-                    "agility" in nombre_lower
-                    or "agility" in texto_bloque.lower()
-                    or "prueba" in nombre_lower
-                )
-            ):
-                eventos.append((nombre, inicio, fin, url, ciudad, estado))
+        Elige el extractor por la huella estructural de la página y la prioridad
+        de su origen ('directo' o 'selenium'). La estrategia que funciona se
+        cachea por origen y hash de estructura (también entre runs), así que las
+        páginas siguientes van directas a ella.
+        """
+        with self._cronometro("parseo"):
+            return self._extraer_eventos_soup(html, origen)
+
+    def _extraer_eventos_soup(self, html: str, origen: str) -> List[Tuple[str, str, str, str, str, str]]:
+        soup = _soup(html)
+        huella_hash, presentes = self._huella_pagina(soup)
+        estructura = f"{origen}/{huella_hash}"
+        cache = self._cache_estrategias()
+
+        conocida = cache.get(estructura, {}).get("estrategia")
+        prioridad = self.PRIORIDAD_EXTRACCION[origen]
+
+        candidatas = [
+            (nombre, metodo)
+            for nombre, huella, metodo in self.ESTRATEGIAS_EXTRACCION
+            if all(presentes.get(sel) for sel in huella)
+        ]
+        candidatas.sort(key=lambda c: (c[0] != conocida, prioridad.index(c[0])))
 
-        # Deduplicado suave por URL/nombre/inicio
-        dedup = []
-        seen = set()
+        for nombre, metodo in candidatas:
+            eventos = getattr(self, metodo)(soup)
 
-        for ev in eventos:
-            nombre, inicio, fin, url, ciudad, estado = ev
-            key = url or f"{nombre}|{inicio}|{ciudad}"
-            if key in seen:
-                continue
-            seen.add(key)
-            dedup.append(ev)
+            if eventos:
+                usos = self.metricas.setdefault("estrategias", {})
+                usos[nombre] = usos.get(nombre, 0) + 1
+
+                if nombre != conocida:
+                    print(f"[DEBUG] Estrategia '{nombre}' para estructura {estructura}")
+                    self._recordar_estrategia(estructura, nombre, self._conteos_pagina(soup))
+                return eventos
+
+            if nombre == conocida:
+                print(f"[WARN] La estrategia cacheada '{nombre}' no da eventos para {estructura}")
 
-        print("      Ejemplos:", [f"{e[5]} · {e[0][:48]}" for e in dedup[:3]])
-        return dedup
+        # Estructura desconocida: se vuelca una vez por estructura nueva para depurar.
+        if estructura not in cache:
+            conteos = self._conteos_pagina(soup)
+            print(f"❓ Estructura de página desconocida {estructura}: {conteos}")
+            self._guardar_debug_html(html, f"rsce_estructura_{origen}_{huella_hash}")
+            self._recordar_estrategia(estructura, None, conteos)
+
+        return []
 
     # ---------- Filtros ----------
-    def _filtrar_eventos(self, eventos):
+    def _evento_vigente(self, ev) -> bool:
         """
         1) Excluye ANULADOS.
         2) Fecha desde hoy: fin >= hoy o, si no hay fin, inicio >= hoy.
            Si no se parsea la fecha, conserva.
         """
+        n, i, f, u, c, estado = ev
+
+        if estado.lower() == "anulado":
+            return False
+
+        if not self.FILTRAR_DESDE_HOY:
+            return True
+
         hoy = datetime.date.today()
-        out = []
+        di, df = parse_date_range(i, f)
 
-        for (n, i, f, u, c, estado) in eventos:
-            if estado.lower() == "anulado":
-                continue
+        return bool(
+            (df and df >= hoy)
+            or (df is None and di and di >= hoy)
+            or (di is None and df is None)
+        )
+
+    def _archivar(self, eventos):
+        """
+        Etapa de histórico (generador): anota cada evento antes del filtro, así
+        el archivo conserva también los pasados y los anulados. Se escribe al
+        final del run, en _guardar_historico.
+        """
+        for ev in eventos:
+            if self.GUARDAR_HISTORICO:
+                self.historico.anotar(ev)
+            yield ev
+
+    def _guardar_historico(self):
+        try:
+            with self._cronometro("historico"):
+                resumen = self.historico.guardar(self.ubicaciones.resolver)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el histórico: {e}")
+            return
+
+        if resumen:
+            self.metricas["historico"] = resumen
+            print(
+                f"🗄️ Histórico: {resumen['nuevos']} nuevos, {resumen['cambios_estado']} cambios de estado, "
+                f"{resumen['total']} eventos en {self.historico.ruta}"
+            )
+
+    def _filtrar_eventos(self, eventos):
+        """
+        Etapa de filtrado (generador): deja pasar solo los eventos vigentes.
+        """
+        for ev in eventos:
+            if self._evento_vigente(ev):
+                self.metricas["eventos_filtrados"] = self.metricas.get("eventos_filtrados", 0) + 1
+                yield ev
+
+    # ---------- Geocoding ----------
+    def _proveedores_geocodificacion(self) -> List["_ProveedorGeocodificacion"]:
+        """
+        Geocodificadores remotos de GEOCODERS, en orden de preferencia.
+        """
+        if self._proveedores is not None:
+            return self._proveedores
+
+        geopy_geocoders = _importar("geopy.geocoders")
+        self._proveedores = []
+
+        for nombre in self.GEOCODERS:
+            if nombre == "nominatim":
+                geolocator = geopy_geocoders.Nominatim(
+                    user_agent="agility-mapper-rsce/1.0",
+                    timeout=10,
+                    domain=self.NOMINATIM_DOMAIN,
+                    scheme=self.NOMINATIM_SCHEME,
+                )
+                proveedor = _ProveedorGeocodificacion(
+                    nombre,
+                    f"{self.NOMINATIM_SCHEME}://{self.NOMINATIM_DOMAIN}",
+                    geolocator.geocode,
+                    min_delay=self.GEOCODE_MIN_DELAY,
+                    concurrencia=self.NOMINATIM_CONCURRENCIA,
+                    reintentos=self.REINTENTOS_GEOCODE,
+                    addressdetails=True,
+                )
+
+            elif nombre == "photon":
+                geolocator = geopy_geocoders.Photon(
+                    user_agent="agility-mapper-rsce/1.0",
+                    timeout=10,
+                    domain=self.PHOTON_DOMAIN,
+                    scheme=self.PHOTON_SCHEME,
+                )
+                proveedor = _ProveedorGeocodificacion(
+                    nombre,
+                    f"{self.PHOTON_SCHEME}://{self.PHOTON_DOMAIN}",
+                    geolocator.geocode,
+                    min_delay=self.PHOTON_MIN_DELAY,
+                    concurrencia=self.PHOTON_CONCURRENCIA,
+                    reintentos=self.REINTENTOS_GEOCODE,
+                )
 
-            if not self.FILTRAR_DESDE_HOY:
-                out.append((n, i, f, u, c, estado))
+            else:
+                print(f"⚠️ Geocodificador desconocido en GEOCODERS: {nombre}")
                 continue
 
-            di, df = parse_date_range(i, f)
+            self._proveedores.append(proveedor)
 
-            keep = (
-                (df and df >= hoy)
-                or (df is None and di and di >= hoy)
-                or (di is None and df is None)
-            )
+        return self._proveedores
 
-            if keep:
-                out.append((n, i, f, u, c, estado))
+    def _geocodificar_lote(self, consultas: List[str]) -> Dict[str, Tuple[object, str]]:
+        """
+        Geocodifica un lote de consultas repartiéndolo entre todos los proveedores
+        a la vez, cada uno con sus propios hilos (concurrencia) y su ritmo.
 
-        return out
+        Un proveedor libre toma la siguiente consulta que aún no haya probado; si
+        no la encuentra (o falla), la consulta vuelve a la cola para otro proveedor.
+        Devuelve {q: (location | None, proveedor)}. Las consultas en las que todos
+        los proveedores han dado error no aparecen: se reintentan en otro run.
+        """
+        proveedores = self._proveedores_geocodificacion()
+        if not proveedores:
+            return {}
+
+        pendientes = collections.deque(dict.fromkeys(consultas))
+        probados = {q: set() for q in pendientes}
+        respondidos = set()
+        resultados = {}
+        cond = threading.Condition()
+        en_vuelo = 0
+
+        def tomar(p):
+            for q in pendientes:
+                if p.nombre not in probados[q]:
+                    pendientes.remove(q)
+                    return q
+            return None
+
+        def trabajador(p):
+            nonlocal en_vuelo
+
+            while True:
+                with cond:
+                    q = tomar(p)
+                    while q is None:
+                        # Nada para este proveedor; solo puede llegar algo si otro falla.
+                        if not en_vuelo:
+                            return
+                        cond.wait()
+                        q = tomar(p)
+                    en_vuelo += 1
+
+                loc, error = None, None
+                try:
+                    with self._cronometro(f"geocode_{p.nombre}"):
+                        loc = p.consultar(q)
+                except Exception as e:
+                    error = e
+
+                with cond:
+                    en_vuelo -= 1
+                    probados[q].add(p.nombre)
+                    p.anotar(loc, error)
+
+                    if error is None:
+                        respondidos.add(q)
+
+                    if loc is not None:
+                        resultados[q] = (loc, p.nombre)
+                    elif len(probados[q]) < len(proveedores):
+                        pendientes.append(q)
+                    elif q in respondidos:
+                        resultados[q] = (None, "")
+
+                    cond.notify_all()
+
+        hilos = sum(p.concurrencia for p in proveedores)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=hilos) as pool:
+            futuros = [pool.submit(trabajador, p) for p in proveedores for _ in range(p.concurrencia)]
+            for f in futuros:
+                f.result()
+
+        return resultados
 
-    # ---------- Geocoding ----------
-    def _geocode_ciudades(self, eventos):
+    @staticmethod
+    def _provincia_de_geocode(loc) -> str:
         """
-        eventos: (n,i,f,u,c,estado) activos.
-        Devuelve dict ciudad -> (lat, lon). Si GEOCODIFICAR=False, devuelve {}.
+        Provincia a partir de la respuesta del geocodificador: 'address' en
+        Nominatim (addressdetails), 'properties' en Photon.
+        En comunidades uniprovinciales a veces solo viene 'state'.
         """
-        cache = {}
+        raw = getattr(loc, "raw", None) or {}
+        address = raw.get("address") or raw.get("properties") or {}
+        for campo in ("province", "state_district", "county", "state"):
+            prov = provincia_canonica(address.get(campo, ""))
+            if prov:
+                return prov
+        return ""
 
-        if not self.GEOCODIFICAR:
-            return cache
+    def _normalizar_ubicaciones(self, registros):
+        """
+        Etapa de canonicalización (generador): añade municipio, provincia y la
+        clave canónica 'municipio|provincia' usando el índice persistido de alias.
+        Geocodificación y agrupación trabajan sobre esa clave, no sobre el texto libre.
+        """
+        for r in registros:
+            u = self.ubicaciones.resolver(r["ciudad"])
+            r["clave_ubicacion"] = u.get("clave", "")
+            r["municipio"] = u.get("municipio", "")
+            r["provincia"] = u.get("provincia", "")
+            yield r
+
+    def _consultas_pendientes(self, r: dict, vistas: set, stats: dict) -> Dict[str, Tuple[str, str]]:
+        """
+        Consultas remotas que necesita un registro: {q: (tipo, clave)}, con tipo
+        'ubicacion' (municipio) o 'direccion' (recinto). Cada clave se mira una
+        sola vez por run; lo ya presente en el índice no genera consulta.
+        """
+        consultas = {}
+        clave = r["clave_ubicacion"]
 
-        geolocator = Nominatim(user_agent="agility-mapper-rsce/1.0", timeout=10)
+        if clave and clave not in vistas:
+            vistas.add(clave)
+            stats["claves"] += 1
 
-        geocode = RateLimiter(
-            geolocator.geocode,
-            min_delay_seconds=1,
-            max_retries=2,
-            error_wait_seconds=2,
-            swallow_exceptions=True,
-        )
+            if not self.ubicaciones.pendiente(clave):
+                stats["aciertos_indice"] += 1
+            elif self.GEOCODIFICAR:
+                q = ", ".join(x for x in (r["municipio"], r["provincia"], "España") if x)
+                consultas[q] = ("ubicacion", clave)
+
+        if r.get("direccion") and r.get("lat_detalle") is None and self.GEOCODIFICAR:
+            cd = self.ubicaciones.clave_direccion(r["direccion"], r["municipio"])
+
+            if cd not in vistas:
+                vistas.add(cd)
 
-        for *_, c, _estado in eventos:
-            if c and c not in cache:
-                q = f"{c}, España"
-                loc = geocode(q)
-                cache[c] = (loc.latitude, loc.longitude) if loc else (None, None)
+                if self.ubicaciones.direccion_pendiente(cd):
+                    q = ", ".join(x for x in (r["direccion"], r["municipio"], r["provincia"], "España") if x)
+                    consultas[q] = ("direccion", cd)
 
-        return cache
+        return consultas
 
-    # ---------- CSV ----------
-    def _guardar_csv(self, eventos):
+    def _claves_geocodificacion(self, r: dict) -> set:
         """
-        eventos: (n,i,f,u,c,estado) activos.
+        Claves del índice de las que dependen las coordenadas de un registro.
         """
-        cache = self._geocode_ciudades(eventos)
+        claves = {r["clave_ubicacion"]} if r["clave_ubicacion"] else set()
 
-        with open(self.OUTCSV, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
+        if r.get("direccion") and r.get("lat_detalle") is None:
+            claves.add(self.ubicaciones.clave_direccion(r["direccion"], r["municipio"]))
 
-            w.writerow(
-                [
-                    "Nombre",
-                    "Fecha inicio",
-                    "Fecha fin",
-                    "URL",
-                    "Ciudad",
-                    "Estado",
-                    "Latitud",
-                    "Longitud",
-                ]
-            )
+        return claves
+
+    def _resolver_lote(self, consultas: Dict[str, Tuple[str, str]], vistas: set, stats: dict):
+        stats["lotes"] += 1
+        stats["consultas"] += len(consultas)
+
+        resultados = self._geocodificar_lote(list(consultas))
 
-            for n, i, f_fin, u, c, estado in eventos:
-                lat, lon = cache.get(c, (None, None)) if c else (None, None)
-                w.writerow([n, i, f_fin, u, c, estado, lat, lon])
+        for q, (tipo, clave) in consultas.items():
+            if q not in resultados:
+                continue
 
-        print(f"📁 CSV guardado en: {self.OUTCSV} con {len(eventos)} eventos")
+            loc, fuente = resultados[q]
+            lat, lon = (loc.latitude, loc.longitude) if loc else (None, None)
 
-    # ---------- GeoJSON ----------
-    def _guardar_geojson(self, eventos):
+            if tipo == "direccion":
+                self.ubicaciones.fijar_direccion(clave, lat, lon, fuente=fuente)
+            else:
+                # Si el proveedor aporta la provincia, la clave pasa a 'municipio|provincia'.
+                vistas.add(
+                    self.ubicaciones.fijar(
+                        clave,
+                        lat,
+                        lon,
+                        provincia=self._provincia_de_geocode(loc) if loc else "",
+                        fuente=fuente,
+                    )
+                )
+
+    def _coordenadas(self, r: dict) -> dict:
         """
-        Genera GeoJSON con puntos (lon,lat) solo para filas con coordenadas válidas.
+        lat/lon de un registro con lo que ya hay en el índice. Precedencia:
+        coordenadas de la ficha > dirección del recinto > municipio.
         """
-        cache = self._geocode_ciudades(eventos)
+        u = self.ubicaciones.resolver(r["ciudad"])
+        r["clave_ubicacion"] = u.get("clave", r["clave_ubicacion"])
+        r["provincia"] = r["provincia"] or u.get("provincia", "")
+        r["lat"], r["lon"] = u.get("lat"), u.get("lon")
+
+        if r.get("lat_detalle") is not None:
+            r["lat"], r["lon"] = r["lat_detalle"], r["lon_detalle"]
 
-        feats = []
+        elif r.get("direccion"):
+            d = self.ubicaciones.direcciones.get(self.ubicaciones.clave_direccion(r["direccion"], r["municipio"]), {})
+            if d.get("lat") is not None:
+                r["lat"], r["lon"] = d["lat"], d["lon"]
 
-        for n, i, f_fin, u, c, estado in eventos:
-            lat, lon = cache.get(c, (None, None)) if c else (None, None)
+        return r
 
+    def _geocodificar(self, registros):
+        """
+        Etapa de geocodificación (generador): añade lat/lon a cada registro.
+
+        Cadena: índice local de ubicaciones/direcciones (persistido entre runs)
+        -> consultas ya lanzadas en este run -> proveedores remotos (GEOCODERS).
+        Solo se retienen los registros cuya ubicación o dirección está en el lote
+        pendiente; el resto sale en el acto (pueden adelantar a los retenidos).
+        El lote se resuelve de una vez, en paralelo, al juntar GEOCODE_LOTE
+        consultas o GEOCODE_VENTANA registros retenidos, o al acabar la entrada.
+        Si GEOCODIFICAR=False, solo usa coordenadas ya conocidas.
+        """
+        stats = self.metricas.setdefault(
+            "geocodificacion", {"claves": 0, "aciertos_indice": 0, "consultas": 0, "lotes": 0}
+        )
+        vistas = set()
+        ventana = []
+        consultas = {}
+        claves_pendientes = set()
+
+        try:
+            for r in registros:
+                for q, (tipo, clave) in self._consultas_pendientes(r, vistas, stats).items():
+                    consultas[q] = (tipo, clave)
+                    claves_pendientes.add(clave)
+
+                if not (self._claves_geocodificacion(r) & claves_pendientes):
+                    yield self._coordenadas(r)
+                    continue
+
+                ventana.append(r)
+
+                if len(consultas) >= self.GEOCODE_LOTE or len(ventana) >= self.GEOCODE_VENTANA:
+                    self._resolver_lote(consultas, vistas, stats)
+                    consultas = {}
+                    claves_pendientes = set()
+                    for x in ventana:
+                        yield self._coordenadas(x)
+                    ventana = []
+
+            if consultas:
+                self._resolver_lote(consultas, vistas, stats)
+            for x in ventana:
+                yield self._coordenadas(x)
+
+        finally:
+            if self._proveedores:
+                stats["proveedores"] = {p.nombre: p.resumen(self._duraciones) for p in self._proveedores}
+
+    # ---------- Detalle ----------
+    CAMPOS_DETALLE = {
+        "organizador": r"organiza(?:dor|do por|)",
+        "direccion": r"direcci[oó]n|lugar de celebraci[oó]n|ubicaci[oó]n|recinto",
+        "jueces": r"jue(?:z|ces)",
+        "grados": r"grados?",
+    }
+
+    def _parsear_detalle(self, html: str) -> dict:
+        """
+        Extrae organizador, dirección, jueces y grados de la página de un evento
+        buscando etiquetas tipo 'Organizador: ...'. Si la etiqueta va sola en su
+        línea, el valor es la línea siguiente. Si hay un mapa embebido con
+        coordenadas, se usan como posición exacta del recinto.
+        """
+        soup = _soup(html)
+        lineas = [self._texto_limpio(x) for x in soup.get_text("\n").split("\n")]
+        lineas = [x for x in lineas if x]
+        datos = {}
+
+        for campo, patron in self.CAMPOS_DETALLE.items():
+            rx = re.compile(rf"^(?:{patron})\s*:\s*(.*)$", flags=re.I)
+
+            for i, linea in enumerate(lineas):
+                m = rx.match(linea)
+                if not m:
+                    continue
+
+                valor = m.group(1) or (lineas[i + 1] if i + 1 < len(lineas) else "")
+                if valor:
+                    datos[campo] = valor[:200]
+                    break
+
+        for iframe in soup.select("iframe[src*='maps']"):
+            src = iframe.get("src", "")
+            m = re.search(r"[?&](?:q|ll)=(-?\d+\.\d+),\s*(-?\d+\.\d+)", src) or re.search(
+                r"!3d(-?\d+\.\d+)!4d(-?\d+\.\d+)", src
+            )
+            if m:
+                datos["lat_detalle"], datos["lon_detalle"] = float(m.group(1)), float(m.group(2))
+                break
+
+        return datos
+
+    @staticmethod
+    def _huella_listado(r: dict) -> str:
+        base = "|".join(r[k] for k in ("nombre", "inicio", "fin", "ciudad", "estado"))
+        return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+    def _cache_detalles(self) -> dict:
+        if self._detalles is None:
             try:
-                if lat is not None and lon is not None:
-                    feats.append(
-                        {
-                            "type": "Feature",
-                            "geometry": {
-                                "type": "Point",
-                                "coordinates": [float(lon), float(lat)],
-                            },
-                            "properties": {
-                                "nombre": n,
-                                "inicio": i,
-                                "fin": f_fin,
-                                "ciudad": c,
-                                "estado": estado,
-                                "url": u,
-                            },
-                        }
-                    )
+                self._detalles = json.loads((self.CACHE_DIR / "detalles.json").read_text(encoding="utf-8"))
             except Exception:
-                pass
+                self._detalles = {}
+        return self._detalles
+
+    def _guardar_cache_detalles(self):
+        if self._detalles is None:
+            return
+        try:
+            self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            (self.CACHE_DIR / "detalles.json").write_text(
+                json.dumps(self._detalles, ensure_ascii=False, indent=1, sort_keys=True),
+                encoding="utf-8",
+            )
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la caché de detalles: {e}")
+
+    def _detalle_vigente(self, entrada: Optional[dict], huella: str) -> bool:
+        """
+        La caché vale si el evento no ha cambiado en el listado y no ha caducado.
+        """
+        if not entrada or entrada.get("huella") != huella:
+            return False
+        try:
+            descargado = datetime.datetime.fromisoformat(entrada["descargado"])
+        except (KeyError, ValueError):
+            return False
+        return (datetime.datetime.now() - descargado).days < self.DETALLE_TTL_DIAS
+
+    def _descargar_detalle(self, url: str, huella: str, previa: Optional[dict]) -> Tuple[dict, str]:
+        """
+        Descarga (condicional) una página de detalle. Se ejecuta en hilos.
+        Devuelve (entrada_de_caché, resultado) con resultado en
+        'descargado' | 'no_modificado' | 'sin_cambios'.
+        """
+        cabeceras = {}
+        if previa:
+            if previa.get("etag"):
+                cabeceras["If-None-Match"] = previa["etag"]
+            if previa.get("last_modified"):
+                cabeceras["If-Modified-Since"] = previa["last_modified"]
+
+        self._limitador.esperar(url)
+
+        with self._cronometro("detalle"):
+            resp = self._sesion_http().get(url, headers=cabeceras, timeout=30)
+
+        ahora = datetime.datetime.now().isoformat(timespec="seconds")
+
+        if resp.status_code == 304 and previa:
+            return {**previa, "huella": huella, "descargado": ahora}, "no_modificado"
+
+        resp.raise_for_status()
+        sha = hashlib.sha256(resp.content).hexdigest()
+
+        entrada = {
+            "huella": huella,
+            "sha256": sha,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "descargado": ahora,
+        }
+
+        # Mismo contenido que la última vez: no hace falta volver a parsear.
+        if previa and previa.get("sha256") == sha:
+            entrada["datos"] = previa.get("datos", {})
+            return entrada, "sin_cambios"
+
+        entrada["datos"] = self._parsear_detalle(resp.text)
+        return entrada, "descargado"
+
+    def _enriquecer_detalle(self, registros):
+        """
+        Etapa de enriquecimiento (generador), opcional con ENRIQUECER_DETALLE.
+
+        Descarga las páginas de detalle con concurrencia acotada
+        (DETALLE_CONCURRENCIA hilos, DETALLE_POR_SEGUNDO por host, sesión
+        keep-alive compartida). Solo se descargan eventos nuevos, cambiados en el
+        listado o con caché caducada. El orden de los registros se conserva y
+        nunca hay más de 2×DETALLE_CONCURRENCIA en vuelo.
+        """
+        if not self.ENRIQUECER_DETALLE:
+            yield from registros
+            return
+
+        cache = self._cache_detalles()
+        stats = self.metricas.setdefault(
+            "detalle", {"cache": 0, "descargado": 0, "no_modificado": 0, "sin_cambios": 0, "errores": 0}
+        )
+        ventana = collections.deque()
+
+        def completar(r, futuro):
+            url = r["url"]
+
+            if futuro is not None:
+                try:
+                    entrada, resultado = futuro.result()
+                    cache[url] = entrada
+                    stats[resultado] += 1
+                except Exception as e:
+                    stats["errores"] += 1
+                    print(f"    ⚠️ Detalle no disponible ({url}): {e}")
+
+            r.update((cache.get(url) or {}).get("datos", {}))
+            return r
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.DETALLE_CONCURRENCIA) as pool:
+            try:
+                for r in registros:
+                    url = r["url"]
+                    futuro = None
+
+                    if url:
+                        huella = self._huella_listado(r)
+                        previa = cache.get(url)
+
+                        if self._detalle_vigente(previa, huella):
+                            stats["cache"] += 1
+                        else:
+                            futuro = pool.submit(self._descargar_detalle, url, huella, previa)
+
+                    ventana.append((r, futuro))
+
+                    while len(ventana) > 2 * self.DETALLE_CONCURRENCIA or (ventana and ventana[0][1] is None):
+                        yield completar(*ventana.popleft())
+
+                while ventana:
+                    yield completar(*ventana.popleft())
+
+            finally:
+                for _, futuro in ventana:
+                    if futuro is not None:
+                        futuro.cancel()
+                self._guardar_cache_detalles()
+
+    # ---------- Salidas ----------
+    def _salidas(self):
+        """
+        Escritores que reciben cada registro en streaming (fan-out).
+        """
+        salidas = [
+            _SalidaCSV(self.OUTCSV),
+            _SalidaGeoJSON(self.OUTGEO),
+        ]
+
+        # Shards y feeds comparten un tope de ficheros abiertos (ulimit de macOS: 256).
+        limite = _LimiteFicheros(self.MAX_FICHEROS_ABIERTOS)
+
+        if self.GENERAR_SHARDS:
+            salidas.append(_SalidaShards(self.DIR_SHARDS, limite))
 
-        fc = {"type": "FeatureCollection", "features": feats}
+        if self.GENERAR_ICS:
+            salidas.append(_SalidaICS(self.DIR_ICS, self.CACHE_DIR / "ics_estado.json", limite))
 
-        with open(self.OUTGEO, "w", encoding="utf-8") as f:
-            json.dump(fc, f, ensure_ascii=False, indent=2)
+        return salidas
 
-        print(f"🧭 GeoJSON guardado en: {self.OUTGEO} ({len(feats)} features)")
+    def _exportar(self, registros) -> int:
+        """
+        Reparte cada registro a todas las salidas según llega.
+        Solo publica los ficheros si el flujo termina sin error y se extrajo
+        algún evento (si no, se conservan los de la ejecución anterior).
+        """
+        salidas = self._salidas()
+        ok = False
+        n = 0
 
-    def _descargar_html_directo(self) -> str:
+        try:
+            for r in registros:
+                if n == 0:
+                    self.metricas["primera_fila_s"] = round(time.perf_counter() - self._t0_run, 4)
+
+                with self._cronometro("escritura"):
+                    for salida in salidas:
+                        salida.escribir(r)
+                n += 1
+            ok = self.metricas.get("eventos_brutos", 0) > 0
+        finally:
+            for salida in salidas:
+                salida.cerrar(ok)
+
+        return n
+
+    def _sesion_http(self):
+        """
+        Sesión requests reutilizada entre páginas (keep-alive).
+        """
+        if self._sesion is None:
+            requests = _importar("requests")
+            retry = _importar("urllib3.util.retry").Retry(
+                total=self.REINTENTOS_HTTP,
+                backoff_factor=1,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+            )
+            # Pool suficiente para las descargas concurrentes de detalle.
+            pool = max(10, self.DETALLE_CONCURRENCIA)
+            self._sesion = requests.Session()
+            for esquema in ("http://", "https://"):
+                self._sesion.mount(
+                    esquema,
+                    requests.adapters.HTTPAdapter(max_retries=retry, pool_connections=pool, pool_maxsize=pool),
+                )
+            self._sesion.headers.update(
+                {
+                    "User-Agent": (
+                        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                        "AppleWebKit/537.36 (KHTML, like Gecko) "
+                        "Chrome/120.0.0.0 Safari/537.36"
+                    ),
+                    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+                }
+            )
+        return self._sesion
+
+    def _url_pagina(self, page_num: int) -> str:
+        if page_num == 1:
+            return self.URL_BASE
+        return self.URL_PAGINA.format(base=self.URL_BASE.rstrip("/"), n=page_num)
+
+    def _descargar_html_directo(self, page_num: int = 1) -> str:
         """
         Descarga directa del HTML sin Selenium.
         La página de RSCE está devolviendo los eventos en el HTML,
         así que esto evita los timeouts del navegador headless.
         """
-        import requests
-
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-            "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
-        }
+        url = self._url_pagina(page_num)
 
-        print("[DEBUG] Descargando HTML directo con requests...")
-        r = requests.get(self.URL_BASE, headers=headers, timeout=60)
+        print(f"[DEBUG] Descargando HTML directo con requests (página {page_num})...")
+        with self._cronometro("descarga"):
+            r = self._sesion_http().get(url, timeout=60)
         r.raise_for_status()
 
         html = r.text
 
-        self.DEBUG_DIR.mkdir(exist_ok=True)
-        (self.DEBUG_DIR / "rsce_requests.html").write_text(html, encoding="utf-8")
+        # Camino caliente: solo se captura si se pide con DEBUG_CAPTURAS=true.
+        if self.DEBUG_CAPTURAS:
+            self._guardar_debug_html(html, "rsce_requests", pagina=page_num, url=url)
 
         print(f"[DEBUG] HTML directo descargado: {len(html)} caracteres")
         return html
 
-    def _extraer_eventos_html_directo(self, html: str):
+    def _extraer_eventos_html_directo(self, soup):
         """
         Extractor específico para el HTML actual de RSCE.
         Busca bloques por títulos h2 que enlazan a eventos y extrae:
         nombre, inicio, fin, url, ciudad, estado.
         """
-        soup = BeautifulSoup(html, "html.parser")
         eventos = []
 
         enlaces = soup.select("h2 a")
@@ -709,113 +2914,239 @@ class RSCEAgilityExporter:
 
             eventos.append((nombre, inicio, fin, url, ciudad, estado))
 
-        # Deduplicado
-        dedup = []
-        seen = set()
+        return self._mostrar_ejemplos(eventos, " directo")
 
-        for ev in eventos:
-            nombre, inicio, fin, url, ciudad, estado = ev
-            key = url or f"{nombre}|{inicio}|{ciudad}"
+    
+    # ---------- Métricas ----------
+    @contextlib.contextmanager
+    def _cronometro(self, etapa: str):
+        """
+        Acumula la duración de cada llamada de una etapa (descarga, parseo, ...).
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._duraciones.setdefault(etapa, []).append(time.perf_counter() - t0)
+
+    def _resumen_etapas(self) -> dict:
+        resumen = {}
+
+        for etapa, ds in self._duraciones.items():
+            ds = sorted(ds)
+            resumen[etapa] = {
+                "n": len(ds),
+                "total_s": round(sum(ds), 4),
+                "media_ms": round(1000 * sum(ds) / len(ds), 2),
+                "p50_ms": round(1000 * ds[len(ds) // 2], 2),
+                "p95_ms": round(1000 * ds[min(len(ds) - 1, int(len(ds) * 0.95))], 2),
+                "max_ms": round(1000 * ds[-1], 2),
+            }
+
+        return resumen
+
+    def _guardar_informe_duplicados(self):
+        """
+        Vuelca qué eventos se han fusionado y por qué. No rompe el run.
+        """
+        self.metricas["duplicados"] = self.duplicados.resumen()
 
-            if key in seen:
-                continue
+        try:
+            with open(self.OUTDUPLICADOS, "w", encoding="utf-8") as f:
+                json.dump(
+                    {**self.metricas["duplicados"], "fusiones": self.duplicados.fusiones},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            print(f"🧬 Duplicados fusionados: {len(self.duplicados.fusiones)} (informe en {self.OUTDUPLICADOS})")
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el informe de duplicados: {e}")
 
-            seen.add(key)
-            dedup.append(ev)
+    def _guardar_metricas(self):
+        """
+        Vuelca las métricas del run (arranque, imports, tiempos) a JSON.
+        No rompe el run si no se puede escribir.
+        """
+        self.metricas["imports_s"] = dict(sorted(_TIEMPOS_IMPORT.items()))
+        self.metricas["etapas"] = self._resumen_etapas()
 
-        print("      Ejemplos directo:", [f"{e[5]} · {e[0][:48]}" for e in dedup[:3]])
-        return dedup
+        try:
+            with open(self.OUTMETRICAS, "w", encoding="utf-8") as f:
+                json.dump(self.metricas, f, ensure_ascii=False, indent=2)
+            print(f"⏱️ Métricas guardadas en: {self.OUTMETRICAS}")
+        except Exception as e:
+            print(f"⚠️ No se pudieron guardar métricas: {e}")
 
-    
     # ---------- Run ----------
     def run(self):
+        t0 = self._t0_run = time.perf_counter()
+        self.metricas["arranque_s"] = round(t0 - _T0_ARRANQUE, 4)
+
+        try:
+            self._run()
+        finally:
+            self.ubicaciones.guardar()
+            self.metricas["ubicaciones"] = {
+                "alias": len(self.ubicaciones.alias),
+                "canonicas": len(self.ubicaciones.ubicaciones),
+            }
+            self.metricas["run_s"] = round(time.perf_counter() - t0, 4)
+            self._guardar_informe_duplicados()
+            self._guardar_metricas()
+
+    def _run(self):
         print(f"[DEBUG] URL_BASE: {self.URL_BASE}")
         print(
             f"[DEBUG] SOLO_PRIMERA={self.SOLO_PRIMERA} | "
             f"APLICAR_FILTRO_UI={self.APLICAR_FILTRO_UI} | "
             f"FILTRAR_DESDE_HOY={self.FILTRAR_DESDE_HOY} | "
-            f"GEOCODIFICAR={self.GEOCODIFICAR}"
+            f"GEOCODIFICAR={self.GEOCODIFICAR} | "
+            f"USAR_SELENIUM={self.USAR_SELENIUM}"
         )
+        print(f"[DEBUG] Arranque: {self.metricas['arranque_s']}s")
 
-        eventos_totales = []
+        flujo = self._eventos_brutos()
+        flujo = self._deduplicar(flujo)
+        flujo = self._archivar(flujo)
+        flujo = self._filtrar_eventos(flujo)
+        flujo = (self._registro(ev) for ev in flujo)
+        flujo = self._normalizar_ubicaciones(flujo)
+        flujo = self._enriquecer_detalle(flujo)
+        flujo = self._geocodificar(flujo)
 
-        # =====================================================
-        # 1) Intento principal: descarga directa sin Selenium
-        # =====================================================
-        try:
-            html = self._descargar_html_directo()
-            eventos_totales = self._extraer_eventos_html_directo(html)
-            print(f"🔍 Total brutos por HTML directo: {len(eventos_totales)}")
+        n = self._exportar(flujo)
 
-        except Exception as e:
-            print(f"⚠️ Falló extracción directa con requests: {e}")
-            eventos_totales = []
+        print(f"🔍 Total brutos final: {self.metricas.get('eventos_brutos', 0)}")
+        print(f"🔍 Tras filtros estado/fecha: {n}")
+
+        if self.metricas.get("eventos_brutos", 0) == 0:
+            raise RuntimeError("No se ha extraído ningún evento de RSCE")
 
-        # =====================================================
-        # 2) Fallback: Selenium, solo si la extracción directa falla
-        # =====================================================
-        if len(eventos_totales) == 0:
-            print("⚠️ Sin eventos por HTML directo. Probando Selenium...")
+        # Solo runs completos: un run a medias no debe adelantar 'ultima_vez'.
+        self._guardar_historico()
 
-            d = None
+    # ---------- Pipeline ----------
+    # páginas -> eventos -> dedupe -> histórico -> filtro -> ubicación canónica -> detalle -> geocode -> salidas
+    # Cada etapa es un generador: los eventos fluyen de uno en uno y las
+    # primeras filas se escriben mientras aún se descargan páginas.
+    def _paginas(self):
+        if self.SOLO_PRIMERA:
+            return [1]
+        return range(1, self.MAX_PAGINAS + 1)
 
+    def _eventos_directo(self):
+        """
+        Descarga directa página a página. Para en la primera página que no
+        aporta eventos nuevos (fin de listado o paginación ignorada por la web)
+        o que no existe (404). Cualquier otro fallo en una página posterior se
+        propaga: un listado a medias no debe publicarse.
+        """
+        for p in self._paginas():
             try:
-                d = self._init_driver()
-                d.get(self.URL_BASE)
+                html = self._descargar_html_directo(p)
+            except Exception as e:
+                respuesta = getattr(e, "response", None)
+                if p > 1 and getattr(respuesta, "status_code", None) == 404:
+                    print(f"    ⏹️ Página {p} no existe (404), fin de paginación.")
+                    return
+                raise
+
+            eventos = self._extraer_eventos(html)
+
+            # Las páginas anteriores ya pasaron por _deduplicar cuando se pide esta.
+            if all(self.duplicados.visto(ev) for ev in eventos):
+                if p > 1:
+                    print(f"    ⏹️ Página {p} sin eventos nuevos, fin de paginación.")
+                return
 
-                time.sleep(3)
-                self._aceptar_cookies_si_aparece(d)
+            print(f"🔍 Brutos por HTML directo en página {p}: {len(eventos)}")
+            yield from eventos
 
-                self._esperar_listado(d)
+    def _eventos_selenium(self):
+        d = None
 
-                if self.APLICAR_FILTRO_UI:
-                    self._aplicar_filtro_desde_hoy_ui(d)
+        try:
+            d = self._init_driver()
+            d.get(self.URL_BASE)
 
-                total_pages = self._detectar_total_paginas(d)
-                pages = [1] if self.SOLO_PRIMERA else list(range(1, total_pages + 1))
+            time.sleep(3)
+            self._aceptar_cookies_si_aparece(d)
 
-                seen_urls = set()
+            self._esperar_listado(d)
 
-                for p in pages:
-                    ok = self._ir_a_pagina(d, p)
+            if self.APLICAR_FILTRO_UI:
+                self._aplicar_filtro_desde_hoy_ui(d)
 
-                    if not ok:
-                        break
+            total_pages = self._detectar_total_paginas(d)
+            pages = [1] if self.SOLO_PRIMERA else list(range(1, total_pages + 1))
 
-                    self._scroll_hasta_el_final(d)
+            for p in pages:
+                ok = self._ir_a_pagina(d, p)
 
-                    eventos = self._extraer_eventos(d.page_source)
+                if not ok:
+                    break
 
-                    nuevos = 0
+                self._scroll_hasta_el_final(d)
 
-                    for ev in eventos:
-                        url = ev[3]
-                        key = url or f"{ev[0]}|{ev[1]}|{ev[4]}"
+                eventos = self._extraer_eventos(d.page_source, origen="selenium")
+                print(f"    ➕ {len(eventos)} en página {p}")
+                yield from eventos
 
-                        if key and key not in seen_urls:
-                            eventos_totales.append(ev)
-                            seen_urls.add(key)
-                            nuevos += 1
+        finally:
+            if d is not None:
+                try:
+                    d.quit()
+                except Exception:
+                    pass
 
-                    print(f"    ➕ {nuevos} nuevos en página {p}")
+    def _eventos_brutos(self):
+        """
+        1) Intento principal: descarga directa sin Selenium.
+        2) Fallback: Selenium, solo si la extracción directa no da nada.
+        """
+        n = 0
 
-            finally:
-                if d is not None:
-                    try:
-                        d.quit()
-                    except Exception:
-                        pass
+        try:
+            for ev in self._eventos_directo():
+                n += 1
+                yield ev
+
+        except Exception as e:
+            # Con eventos ya emitidos no hay fallback posible: el listado estaría
+            # incompleto y las salidas no deben publicarse.
+            if n > 0:
+                raise RuntimeError(f"Descarga directa interrumpida tras {n} eventos: {e}") from e
+            print(f"⚠️ Falló extracción directa con requests: {e}")
 
-        print(f"🔍 Total brutos final: {len(eventos_totales)}")
+        if n > 0:
+            return
 
-        if len(eventos_totales) == 0:
-            raise RuntimeError("No se ha extraído ningún evento de RSCE")
+        if not self.USAR_SELENIUM:
+            print("⚠️ Sin eventos por HTML directo y USAR_SELENIUM=false: no hay fallback.")
+            return
 
-        eventos_final = self._filtrar_eventos(eventos_totales)
-        print(f"🔍 Tras filtros estado/fecha: {len(eventos_final)}")
+        print("⚠️ Sin eventos por HTML directo. Probando Selenium...")
+        yield from self._eventos_selenium()
+
+    def _deduplicar(self, eventos):
+        for ev in eventos:
+            self.metricas["eventos_brutos"] = self.metricas.get("eventos_brutos", 0) + 1
 
-        self._guardar_csv(eventos_final)
-        self._guardar_geojson(eventos_final)
+            if self.duplicados.registrar(ev):
+                yield ev
+
+    @staticmethod
+    def _registro(ev) -> dict:
+        n, i, f, u, c, estado = ev
+        return {
+            "nombre": n,
+            "inicio": i,
+            "fin": f,
+            "url": u,
+            "ciudad": c,
+            "estado": estado,
+        }
 
 
 if __name__ == "__main__":